@@ -0,0 +1,109 @@
+"""Archivo histórico de pedidos.
+
+Uso (desde la raíz del repo):
+
+    python -m backend.archivo          # mueve los archivados hace más de ARCHIVO_DIAS días
+    python -m backend.archivo 365
+"""
+import os
+import sys
+from datetime import timedelta
+
+from sqlalchemy import delete, insert, literal, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import insert_for
+
+# Delivered orders stay archivado=True in the hot tables until they have
+# gone ARCHIVO_DIAS days without changes; then they move, with their books
+# and payments, to the tables of the same name in the archivo schema (see
+# database.py) and the hot rows are deleted. Moves go in batches of LOTE
+# orders with Core statements: no mapper events fire, so the daily rollup
+# keeps those payments (reportes.py counts the archive when rebuilding) and
+# sync clients get a baja for every row that left.
+#
+# On SQLite the archive is another file, and under WAL a transaction across
+# attached files is not atomic as a whole. So each batch is copied and
+# committed first, then copied again (catching rows added meanwhile) and
+# deleted. A crash in between leaves the order in both places, and the next
+# run finishes the move.
+ARCHIVO_DIAS = int(os.environ.get("ARCHIVO_DIAS", 180))
+LOTE = 500
+
+TABLAS = [  # (hot, archive, column pointing at the pedido)
+    (models.Pedido, models.PedidoArchivo, "id"),
+    (models.LibroPedido, models.LibroPedidoArchivo, "pedido_id"),
+    (models.PagoPedido, models.PagoPedidoArchivo, "pedido_id"),
+]
+
+def _copiar(db: Session, origen, destino, columna: str, ids, ignorar_existentes: bool, **fijos):
+    O, D = origen.__table__, destino.__table__
+    columnas = [c.name for c in D.columns if c.name in O.c and c.name not in fijos]
+    filas = select(*(O.c[c] for c in columnas), *(literal(v, D.c[k].type) for k, v in fijos.items()))
+    stmt = insert_for(destino) if ignorar_existentes else insert(destino)
+    stmt = stmt.from_select(columnas + list(fijos), filas.where(O.c[columna].in_(ids)))
+    db.execute(stmt.on_conflict_do_nothing() if ignorar_existentes else stmt)
+
+def _borrar(db: Session, tablas, ids):
+    for modelo, columna in tablas:
+        T = modelo.__table__
+        db.execute(delete(T).where(T.c[columna].in_(ids)))
+
+def _copiar_al_archivo(db: Session, ids, ahora):
+    for caliente, archivo, columna in TABLAS:
+        fijos = {"movido_en": ahora} if "movido_en" in archivo.__table__.c else {}
+        _copiar(db, caliente, archivo, columna, ids, True, **fijos)
+
+def archivar(db: Session, dias: int = ARCHIVO_DIAS) -> int:
+    """Mueve al archivo los pedidos archivados sin cambios hace más de `dias` días; devuelve cuántos."""
+    P = models.Pedido
+    corte = models.ahora() - timedelta(days=dias)
+    listos = select(P.id).where(P.archivado == True, P.updated_at < corte)
+    movidos = 0
+    while True:
+        ids = db.scalars(listos.order_by(P.id).limit(LOTE)).all()
+        if not ids:
+            return movidos
+        ahora = models.ahora()
+        _copiar_al_archivo(db, ids, ahora)
+        db.commit()
+
+        # An order touched since the copy (un-archived, say) stays hot
+        quedan = db.scalars(listos.where(P.id.in_(ids)).with_for_update()).all()
+        descartados = set(ids) - set(quedan)
+        if descartados:
+            _borrar(db, [(a, c) for _, a, c in reversed(TABLAS)], descartados)
+        _copiar_al_archivo(db, quedan, ahora)
+        for caliente, _, columna in TABLAS:
+            T = caliente.__table__
+            db.execute(insert(models.Baja).from_select(
+                ["tabla", "fila_id", "deleted_at"],
+                select(literal(T.name), T.c.id, literal(ahora, models.Baja.deleted_at.type)).where(T.c[columna].in_(quedan)),
+            ))
+        _borrar(db, [(c, col) for c, _, col in reversed(TABLAS)], quedan)
+        db.commit()
+        movidos += len(quedan)
+
+def restaurar(db: Session, pedido_id: int) -> bool:
+    """Devuelve un pedido del archivo a las tablas activas (False si no está archivado).
+
+    Los ids se conservan; si alguno ya está en uso lanza IntegrityError.
+    """
+    if db.get(models.PedidoArchivo, pedido_id) is None:
+        return False
+    ahora = models.ahora()
+    for caliente, archivo, columna in TABLAS:
+        # A fresh updated_at so sync clients pick the rows up again
+        _copiar(db, archivo, caliente, columna, [pedido_id], False, updated_at=ahora)
+    db.commit()
+    _borrar(db, [(a, c) for _, a, c in reversed(TABLAS)], [pedido_id])
+    db.commit()
+    return True
+
+if __name__ == "__main__":
+    from .database import SessionLocal, engine
+    models.Base.metadata.create_all(bind=engine)
+    dias = int(sys.argv[1]) if len(sys.argv) > 1 else ARCHIVO_DIAS
+    with SessionLocal() as db:
+        print(f"{archivar(db, dias)} pedidos movidos al archivo.")
@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Optional
+from datetime import date
+
+from . import metricas, models, respuestas, schemas, search as fts
+from .auth import get_current_user
+from .database import async_engine, get_async_db
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, entre_fechas, paginate_async
+
+metricas.instrumentar(async_engine.sync_engine)
+
+# Async versions of the read endpoints in main.py, mounted only when
+# DB_ASYNC=1. They return the same schemas and honour the same paging
+# parameters; relationships must be eager-loaded since lazy loads are not
+# possible on an AsyncSession. The catalogs (/categorias/, /grados/,
+# /anios-fotocopia/) are not duplicated here: main.py answers them from the
+# per-version cache in catalogo.py.
+router = APIRouter(dependencies=[Depends(get_current_user)], route_class=metricas.RutaMedida)
+
+PEDIDO_LOAD = (selectinload(models.Pedido.libros), selectinload(models.Pedido.pagos))
+
+@router.get("/productos/", response_model=List[schemas.Producto])
+async def list_productos(response: Response, search: str = "", after_id: Optional[int] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db: AsyncSession = Depends(get_async_db)):
+    stmt = select(models.Producto)
+    if search:
+        stmt = fts.filter_productos(stmt, models.Producto, search, async_engine.dialect.name).limit(limit)
+        return respuestas.lista(schemas.Producto, (await db.scalars(stmt)).all(), response)
+    items = await paginate_async(db, stmt, models.Producto, response, after_id, limit)
+    return respuestas.lista(schemas.Producto, items, response)
+
+@router.get("/pedidos/", response_model=List[schemas.Pedido])
+async def list_pedidos(response: Response, desde: Optional[date] = None, hasta: Optional[date] = None, after_id: Optional[int] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db: AsyncSession = Depends(get_async_db)):
+    stmt = select(models.Pedido).options(*PEDIDO_LOAD).where(models.Pedido.archivado == False, *entre_fechas(models.Pedido.fecha, desde, hasta))
+    items = await paginate_async(db, stmt, models.Pedido, response, after_id, limit)
+    return respuestas.lista(schemas.Pedido, items, response)
+
+@router.get("/pedidos/archivados/", response_model=List[schemas.Pedido])
+async def list_pedidos_archivados(response: Response, desde: Optional[date] = None, hasta: Optional[date] = None, after_id: Optional[int] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db: AsyncSession = Depends(get_async_db)):
+    stmt = select(models.Pedido).options(*PEDIDO_LOAD).where(models.Pedido.archivado == True, *entre_fechas(models.Pedido.fecha, desde, hasta))
+    items = await paginate_async(db, stmt, models.Pedido, response, after_id, limit)
+    return respuestas.lista(schemas.Pedido, items, response)
+
+@router.get("/stock/", response_model=List[schemas.StockLibro])
+async def list_stock(response: Response, after_id: Optional[int] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db: AsyncSession = Depends(get_async_db)):
+    items = await paginate_async(db, select(models.StockLibro), models.StockLibro, response, after_id, limit)
+    return respuestas.lista(schemas.StockLibro, items, response)
+
+@router.get("/trabajos-fotocopia/", response_model=List[schemas.TrabajoFotocopia])
+async def list_trabajos(response: Response, desde: Optional[date] = None, hasta: Optional[date] = None, after_id: Optional[int] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db: AsyncSession = Depends(get_async_db)):
+    stmt = select(models.TrabajoFotocopia).options(selectinload(models.TrabajoFotocopia.pagos))
+    stmt = stmt.where(*entre_fechas(models.TrabajoFotocopia.fecha, desde, hasta))
+    items = await paginate_async(db, stmt, models.TrabajoFotocopia, response, after_id, limit)
+    return respuestas.lista(schemas.TrabajoFotocopia, items, response)
+
+@router.get("/clientes/", response_model=List[schemas.Cliente])
+async def list_clientes(response: Response, after_id: Optional[int] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db: AsyncSession = Depends(get_async_db)):
+    stmt = select(models.Cliente).options(selectinload(models.Cliente.transacciones))
+    items = await paginate_async(db, stmt, models.Cliente, response, after_id, limit)
+    return respuestas.lista(schemas.Cliente, items, response)
@@ -1,4 +1,9 @@
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
+import hashlib
+import os
+import threading
+import time
 import bcrypt
 from jose import JWTError, jwt
 from fastapi.security import OAuth2PasswordBearer
@@ -8,13 +13,46 @@ SECRET_KEY = "epaminondas_super_secret"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# bcrypt work factor for new hashes; stored hashes with a different cost are
+# rehashed on the next successful login.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+
+# Every API call depends on get_current_user, so verified tokens are kept in
+# a bounded LRU keyed by the token's SHA-256. Entries never outlive the
+# token's own exp claim.
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 1024))
+TOKEN_CACHE_TTL = int(os.environ.get("TOKEN_CACHE_TTL", 300))
+
+# Failed logins allowed per username from one client IP, and per IP overall,
+# inside the window before further attempts are refused without running
+# bcrypt. The username limit is per IP so that guessing from one machine
+# can't lock the shop's account out of the others. At most
+# LOGIN_TRACKED_KEYS counters are kept; the stalest go first.
+LOGIN_MAX_FAILURES_USER = int(os.environ.get("LOGIN_MAX_FAILURES_USER", 5))
+LOGIN_MAX_FAILURES_IP = int(os.environ.get("LOGIN_MAX_FAILURES_IP", 20))
+LOGIN_WINDOW_SECONDS = int(os.environ.get("LOGIN_WINDOW_SECONDS", 300))
+LOGIN_TRACKED_KEYS = int(os.environ.get("LOGIN_TRACKED_KEYS", 10000))
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
 
+_token_cache = OrderedDict()  # sha256(token) -> (username, valid_until)
+_token_lock = threading.Lock()
+
+_login_failures = OrderedDict()  # "u:<username>@<address>" / "ip:<address>" -> deque of timestamps, last failure last
+_login_lock = threading.Lock()
+
 def verify_password(plain_password, hashed_password):
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 def get_password_hash(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+def password_needs_rehash(hashed_password) -> bool:
+    # "$2b$12$<salt+hash>": the cost is the third field
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -23,6 +61,30 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def decode_token(token: str) -> str:
+    """Devuelve el usuario del token, usando la caché si ya fue verificado."""
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    now = time.time()
+    with _token_lock:
+        hit = _token_cache.get(key)
+        if hit and hit[1] > now:
+            _token_cache.move_to_end(key)
+            return hit[0]
+        if hit:
+            del _token_cache[key]
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    username = payload.get("sub")
+    if username is None:
+        raise JWTError("Token sin usuario")
+    valid_until = min(float(payload.get("exp", now)), now + TOKEN_CACHE_TTL)
+    with _token_lock:
+        _token_cache[key] = (username, valid_until)
+        _token_cache.move_to_end(key)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return username
+
 def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -30,10 +92,49 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
+        return decode_token(token)
     except JWTError:
         raise credentials_exception
-    return username
+
+def _recent_failures(key, now):
+    intentos = _login_failures.get(key)
+    while intentos and intentos[0] <= now - LOGIN_WINDOW_SECONDS:
+        intentos.popleft()
+    if intentos is not None and not intentos:
+        del _login_failures[key]
+        return None
+    return intentos
+
+def _login_keys(username: str, ip: str):
+    return ((f"u:{username}@{ip}", LOGIN_MAX_FAILURES_USER), (f"ip:{ip}", LOGIN_MAX_FAILURES_IP))
+
+def _evict_login_failures(now):
+    # Keys are ordered by their last failure, so expired ones are at the front
+    while _login_failures:
+        key, intentos = next(iter(_login_failures.items()))
+        if intentos[-1] > now - LOGIN_WINDOW_SECONDS and len(_login_failures) <= LOGIN_TRACKED_KEYS:
+            break
+        del _login_failures[key]
+
+def login_retry_after(username: str, ip: str) -> int:
+    """Segundos a esperar antes de otro intento de login (0 si está permitido)."""
+    now = time.time()
+    espera = 0
+    with _login_lock:
+        for key, limite in _login_keys(username, ip):
+            intentos = _recent_failures(key, now)
+            if intentos and len(intentos) >= limite:
+                espera = max(espera, int(intentos[0] + LOGIN_WINDOW_SECONDS - now) + 1)
+    return espera
+
+def register_login_failure(username: str, ip: str):
+    now = time.time()
+    with _login_lock:
+        for key, limite in _login_keys(username, ip):
+            _login_failures.setdefault(key, deque(maxlen=limite)).append(now)
+            _login_failures.move_to_end(key)
+        _evict_login_failures(now)
+
+def clear_login_failures(username: str, ip: str):
+    with _login_lock:
+        _login_failures.pop(f"u:{username}@{ip}", None)
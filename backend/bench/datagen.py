@@ -0,0 +1,229 @@
+"""Genera datos sintéticos directamente en la base, a la escala pedida.
+
+Uso (desde la raíz del repo):
+
+    python -m backend.bench.datagen --url sqlite:///bench.db --escala grande
+    python -m backend.bench.datagen --url sqlite:///bench.db --productos 100000 --pedidos 50000 --transacciones 1000000
+
+La base tiene que estar vacía. Los ids se asignan acá, así las claves
+foráneas se arman sin consultar lo insertado, y todo entra con inserts
+Core de a LOTE filas. Con la misma --semilla se obtienen los mismos datos.
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import bindparam, func, insert, select, text, update
+
+LOTE = 10_000
+
+ESCALAS = {
+    "demo": {"productos": 200, "pedidos": 30, "clientes": 15, "transacciones": 100, "trabajos": 20},
+    "chica": {"productos": 1_000, "pedidos": 500, "clientes": 200, "transacciones": 5_000, "trabajos": 500},
+    "mediana": {"productos": 20_000, "pedidos": 10_000, "clientes": 2_000, "transacciones": 100_000, "trabajos": 5_000},
+    "grande": {"productos": 100_000, "pedidos": 50_000, "clientes": 10_000, "transacciones": 1_000_000, "trabajos": 20_000},
+}
+
+CATEGORIAS = [("Libros", 30), ("Útiles", 45), ("Revistas", 25), ("Juguetería", 50),
+              ("Regalería", 60), ("Papelería", 40), ("Tecnología", 20), ("Kiosco", 35)]
+GRADOS = ["Pack 1er Año EP", "Pack 2do Año EP", "Pack 3er Año EP", "Pack 4to Año EP", "Pack 5to Año EP",
+          "Pack 6to Año EP", "Combo 1er Año ES", "Combo 2do Año ES", "Combo 3er Año ES", "Combo 4to Año ES",
+          "Combo 5to Año ES", "Combo 6to Año ES"]
+MATERIAS = ["Matemática", "Ciencias Naturales", "Prácticas del Lenguaje", "Ciencias Sociales", "Físico Química",
+            "Historia", "Geografía", "Biología", "Inglés", "Construcción de Ciudadanía"]
+EDITORIALES = ["Kapelusz", "Puerto de Palos", "Santillana", "Estrada", "Mandioca", "Huellas", "AZ", "Tinta Fresca"]
+ARTICULOS = ["Cuaderno", "Carpeta", "Lápiz", "Birome", "Resaltador", "Goma", "Regla", "Compás", "Mochila",
+             "Cartuchera", "Block", "Repuesto", "Marcador", "Tijera", "Plasticola", "Agenda", "Calculadora"]
+MARCAS = ["Rivadavia", "Gloria", "Faber", "Bic", "Filgo", "Staedtler", "Maped", "Exito", "Casio", "Pizzini"]
+NOMBRES = ["Lucía", "Martín", "Sofía", "Joaquín", "Florencia", "Valentín", "Micaela", "Tomás", "Carolina",
+           "Emilio", "Agustina", "Ramiro", "Paula", "Facundo", "Camila", "Nicolás", "Julieta", "Mateo"]
+APELLIDOS = ["García", "Fernández", "López", "Gómez", "Díaz", "Pérez", "Romero", "Sosa", "Torres", "Ruiz",
+             "Álvarez", "Benítez", "Acosta", "Medina", "Herrera", "Suárez"]
+ESTADOS_LIBRO = [("faltante", 3), ("pedido", 2), ("en_local", 2), ("entregado", 5)]
+ESTADOS_TRABAJO = [("pendiente", 2), ("listo", 2), ("entregado", 6)]
+
+def generar(url: str, escala: dict, semilla: int = 42, verbose: bool = False) -> dict:
+    """Llena una base vacía y devuelve la cantidad de filas por tabla."""
+    from .. import models, reportes
+    from ..database import make_engine
+    from ..precios import calc_price
+
+    rnd = random.Random(semilla)
+    hoy = date.today()
+    engine = make_engine(url)
+    models.Base.metadata.create_all(engine)
+    conteo = {}
+
+    def fecha(dias_max=730):
+        return hoy - timedelta(days=rnd.randint(0, dias_max))
+
+    def persona():
+        return f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}"
+
+    def telefono():
+        return f"11{rnd.randint(11111111, 99999999)}"
+
+    def cargar(conn, model, filas):
+        t0 = time.perf_counter()
+        n = 0
+        lote = []
+        for fila in filas:
+            lote.append(fila)
+            if len(lote) == LOTE:
+                conn.execute(insert(model), lote)
+                n += len(lote)
+                lote = []
+        if lote:
+            conn.execute(insert(model), lote)
+            n += len(lote)
+        conteo[model.__tablename__] = n
+        if verbose:
+            print(f"  {model.__tablename__:<22}{n:>10} filas en {time.perf_counter() - t0:6.1f} s")
+
+    with engine.begin() as conn:
+        for model in (models.Producto, models.Pedido, models.Cliente, models.TrabajoFotocopia):
+            if conn.execute(select(func.count()).select_from(model)).scalar():
+                raise SystemExit(f"La base ya tiene datos en {model.__tablename__}")
+
+        cargar(conn, models.Categoria, (
+            {"id": i, "nombre": n, "margen_porcentaje": m} for i, (n, m) in enumerate(CATEGORIAS, 1)
+        ))
+
+        def productos():
+            for i in range(1, escala["productos"] + 1):
+                cat = rnd.randint(1, len(CATEGORIAS))
+                if cat == 1:
+                    isbn = f"978-950-{rnd.randint(10, 99)}-{rnd.randint(1000, 9999)}-{rnd.randint(0, 9)}"
+                    desc = f"{rnd.choice(MATERIAS)} {rnd.randint(1, 6)} - {rnd.choice(EDITORIALES)}"
+                else:
+                    isbn = str(rnd.randint(7790000000000, 7799999999999)) if rnd.random() < 0.7 else None
+                    desc = f"{rnd.choice(ARTICULOS)} {rnd.choice(MARCAS)} {rnd.randint(1, 500)}"
+                costo = round(rnd.uniform(200, 40000), 2)
+                precio = calc_price(costo, CATEGORIAS[cat - 1][1])
+                yield {"id": i, "isbn": isbn, "descripcion": desc, "costo_base": costo,
+                       "precio_publico": precio, "categoria_id": cat}
+        cargar(conn, models.Producto, productos())
+
+        packs = {}
+        libros_catalogo = []
+        for g in range(1, len(GRADOS) + 1):
+            packs[g] = []
+            for materia in rnd.sample(MATERIAS, 6):
+                editorial = rnd.choice(EDITORIALES)
+                titulo = f"{materia} {(g - 1) % 6 + 1} - {editorial}"
+                precio = rnd.choice([4500, 8500, 12000, 15000, 22000, 28000])
+                packs[g].append((titulo, precio))
+                libros_catalogo.append({"id": len(libros_catalogo) + 1, "grado_id": g, "titulo": titulo,
+                                        "editorial": editorial, "precio": precio})
+        cargar(conn, models.Grado, ({"id": i, "nombre": n} for i, n in enumerate(GRADOS, 1)))
+        cargar(conn, models.LibroCatalogo, libros_catalogo)
+
+        titulos = sorted({t for libros in packs.values() for t, _ in libros})
+        cargar(conn, models.StockLibro, (
+            {"id": i, "titulo": t, "tipo": tipo, "cantidad": rnd.randint(0, 15)}
+            for i, (t, tipo) in enumerate(((t, tipo) for t in titulos for tipo in ("nuevo", "usado")), 1)
+        ))
+
+        pedidos, libros, pagos = [], [], []
+        for p in range(1, escala["pedidos"] + 1):
+            f = fecha()
+            pack = packs[rnd.randint(1, len(GRADOS))]
+            estados = [e for e, w in ESTADOS_LIBRO for _ in range(w)]
+            elegidos = rnd.sample(pack, rnd.randint(1, len(pack)))
+            estados_pedido = [rnd.choice(estados) for _ in elegidos]
+            pedidos.append({
+                "id": p, "cliente": persona(), "telefono": telefono(), "fecha": f,
+                "fecha_tentativa": f + timedelta(days=rnd.randint(3, 30)),
+                "archivado": all(e == "entregado" for e in estados_pedido),
+            })
+            for (titulo, precio), estado in zip(elegidos, estados_pedido):
+                libros.append({"id": len(libros) + 1, "pedido_id": p, "titulo": titulo, "precio": precio, "estado": estado})
+            total = sum(precio for _, precio in elegidos)
+            if rnd.random() < 0.7:
+                pagos.append({"id": len(pagos) + 1, "pedido_id": p, "monto": rnd.choice([0.3, 0.5]) * total,
+                              "fecha": f, "nota": "Seña inicial"})
+            if rnd.random() < 0.4:
+                pagos.append({"id": len(pagos) + 1, "pedido_id": p, "monto": rnd.choice([0.2, 0.5]) * total,
+                              "fecha": f, "nota": None})
+        cargar(conn, models.Pedido, pedidos)
+        cargar(conn, models.LibroPedido, libros)
+        cargar(conn, models.PagoPedido, pagos)
+        del pedidos, libros, pagos
+
+        materiales = []
+        anios = ["1er Año", "2do Año", "3er Año", "4to Año", "5to Año", "6to Año"]
+        for a in range(1, len(anios) + 1):
+            for m in rnd.sample(MATERIAS, 8):
+                materiales.append({"id": len(materiales) + 1, "anio_id": a, "titulo": f"Apunte {m}",
+                                   "descripcion": None, "precio": rnd.choice([1500, 2500, 4000, 6000])})
+        cargar(conn, models.AnioFotocopia, ({"id": i, "nombre": n} for i, n in enumerate(anios, 1)))
+        cargar(conn, models.MaterialCatalogo, materiales)
+
+        trabajos, pagos_fc = [], []
+        estados = [e for e, w in ESTADOS_TRABAJO for _ in range(w)]
+        for t in range(1, escala["trabajos"] + 1):
+            mat = rnd.choice(materiales)
+            cantidad = rnd.randint(1, 30)
+            estado = rnd.choice(estados)
+            f = fecha()
+            trabajos.append({"id": t, "solicitante": persona(), "material": mat["titulo"], "cantidad": cantidad,
+                             "precio": mat["precio"] * cantidad, "telefono": telefono(), "estado": estado, "fecha": f})
+            if estado == "entregado" or rnd.random() < 0.3:
+                pagos_fc.append({"id": len(pagos_fc) + 1, "trabajo_id": t, "monto": mat["precio"] * cantidad,
+                                 "fecha": f, "nota": None})
+        cargar(conn, models.TrabajoFotocopia, trabajos)
+        cargar(conn, models.PagoFotocopia, pagos_fc)
+        del trabajos, pagos_fc
+
+        n_clientes = max(1, escala["clientes"])
+        cargar(conn, models.Cliente, (
+            {"id": c, "nombre": persona(), "telefono": telefono(), "saldo_total": 0.0}
+            for c in range(1, n_clientes + 1)
+        ))
+
+        saldos = [0.0] * (n_clientes + 1)
+
+        def transacciones():
+            for i in range(1, escala["transacciones"] + 1):
+                c = rnd.randint(1, n_clientes)
+                tipo = "cargo" if rnd.random() < 0.6 else "abono"
+                monto = float(rnd.randint(5, 300) * 100)
+                saldos[c] += monto if tipo == "cargo" else -monto
+                yield {"id": i, "cliente_id": c, "fecha": fecha(), "tipo_operacion": tipo, "monto": monto,
+                       "detalle": rnd.choice(ARTICULOS) if tipo == "cargo" else "Pago a cuenta"}
+        cargar(conn, models.TransaccionFiado, transacciones())
+        C = models.Cliente.__table__
+        conn.execute(
+            update(C).where(C.c.id == bindparam("b_id")).values(saldo_total=bindparam("b_saldo")),
+            [{"b_id": c, "b_saldo": saldos[c]} for c in range(1, n_clientes + 1)],
+        )
+        # Core inserts skip the mapper events that keep the daily summary
+        reportes.reconstruir(conn)
+
+        if conn.dialect.name == "postgresql":
+            # Ids were given explicitly; move the serial sequences past them
+            for tabla in conteo:
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{tabla}', 'id'), "
+                    f"coalesce((SELECT max(id) FROM {tabla}), 0) + 1, false)"
+                ))
+    engine.dispose()
+    return conteo
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", required=True, help="URL SQLAlchemy de una base vacía")
+    parser.add_argument("--escala", choices=ESCALAS, default="chica")
+    parser.add_argument("--semilla", type=int, default=42)
+    for campo in ESCALAS["chica"]:
+        parser.add_argument(f"--{campo}", type=int, help=f"sobrescribe la cantidad de {campo} de la escala")
+    args = parser.parse_args()
+
+    escala = {k: getattr(args, k) if getattr(args, k) is not None else v for k, v in ESCALAS[args.escala].items()}
+    t0 = time.perf_counter()
+    conteo = generar(args.url, escala, args.semilla, verbose=True)
+    print(f"{sum(conteo.values())} filas en {time.perf_counter() - t0:.1f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Prueba de carga de los listados en modo sync vs. async (DB_ASYNC=1).
+
+Uso (desde la raíz del repo):
+
+    python -m backend.bench.load --requests 2000 --concurrency 50
+
+Genera una base temporal con backend.bench.datagen y, para cada modo, levanta la
+app en un proceso aparte (la configuración se lee al importar) y le pega
+en proceso con httpx.ASGITransport. Informa requests/s y latencias p50/p99.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from .datagen import ESCALAS, generar
+
+ENDPOINTS = ["/api/pedidos/", "/api/productos/", "/api/clientes/", "/api/trabajos-fotocopia/", "/api/stock/"]
+
+async def drive(total, concurrency):
+    from .run import cliente, medir
+
+    async with cliente() as c:
+        async def pedir(i):
+            return (await c.get(ENDPOINTS[i % len(ENDPOINTS)])).status_code
+
+        await pedir(0)  # warm up pools and caches
+        return await medir(pedir, total, concurrency)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(drive(args.requests, args.concurrency))))
+        return
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    generar(url, ESCALAS["chica"])
+    print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'err':>6}")
+    for mode, flag in (("sync", "0"), ("async", "1")):
+        env = {**os.environ, "DATABASE_URL": url, "DB_ASYNC": flag}
+        out = subprocess.run(
+            [sys.executable, "-m", "backend.bench.load", "--worker",
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{mode:<8}{r['rps']:>10.0f}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['errores']:>6}")
+
+if __name__ == "__main__":
+    main()
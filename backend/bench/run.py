@@ -0,0 +1,182 @@
+"""Benchmark de la API: clientes concurrentes contra la app real, en proceso.
+
+Uso (desde la raíz del repo):
+
+    python -m backend.bench.run --escala mediana --clientes 20 --requests 200 --salida base.json
+    FAST_JSON=1 python -m backend.bench.run --url sqlite:///bench.db --salida fast.json
+    python -m backend.bench.run --comparar base.json fast.json
+
+Sin --url genera una base temporal con backend.bench.datagen. La app se
+importa después de apuntar DATABASE_URL a esa base, así que las variables
+de entorno de configuración (DB_ASYNC, FAST_JSON, ...) aplican como en
+producción y quedan registradas en el resultado. Cada endpoint recibe
+--requests pedidos repartidos entre --clientes tareas concurrentes sobre
+httpx.ASGITransport; se informa throughput y p50/p95/p99 por endpoint.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ENDPOINTS = [
+    "/api/productos/?limit=100",
+    "/api/productos/?search=matematica",
+    "/api/categorias/",
+    "/api/grados/",
+    "/api/pedidos/?limit=100",
+    "/api/pedidos/archivados/?limit=100",
+    "/api/stock/?limit=100",
+    "/api/anios-fotocopia/",
+    "/api/trabajos-fotocopia/?limit=100",
+    "/api/clientes/?limit=100",
+]
+
+CONFIG_VARS = ["DB_ASYNC", "FAST_JSON", "COMPRESSION_MIN_BYTES", "DB_POOL_SIZE", "DB_MAX_OVERFLOW",
+               "SQLITE_JOURNAL_MODE", "SQLITE_SYNCHRONOUS", "SQLITE_CACHE_KB"]
+
+def percentil(valores, p):
+    """El valor en la fracción p de una lista ya ordenada."""
+    return valores[min(len(valores) - 1, int(p * len(valores)))]
+
+def resumir(latencias, errores, elapsed):
+    latencias.sort()
+    return {
+        "requests": len(latencias),
+        "errores": errores,
+        "rps": len(latencias) / elapsed if elapsed else 0.0,
+        "mean_ms": sum(latencias) / len(latencias) * 1000 if latencias else 0.0,
+        "p50_ms": percentil(latencias, 0.50) * 1000 if latencias else 0.0,
+        "p95_ms": percentil(latencias, 0.95) * 1000 if latencias else 0.0,
+        "p99_ms": percentil(latencias, 0.99) * 1000 if latencias else 0.0,
+    }
+
+def encabezados():
+    """Authorization de un usuario de prueba para pegarle a la API."""
+    from ..auth import create_access_token
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'bench'})}"}
+
+@contextlib.asynccontextmanager
+async def cliente():
+    """httpx.AsyncClient autenticado contra la app, en proceso."""
+    import httpx
+    from ..main import app
+
+    # Under load most requests cross SLOW_REQUEST_MS; the log would drown the table
+    logging.getLogger("backend.metricas").setLevel(logging.ERROR)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=encabezados(), timeout=None) as c:
+        yield c
+
+async def medir(pedir, total, concurrencia):
+    """Llama pedir(i) `total` veces desde `concurrencia` tareas y resume las latencias.
+
+    pedir devuelve el status HTTP; los >= 400 cuentan como errores.
+    """
+    latencias, errores = [], 0
+    pendientes = iter(range(total))
+
+    async def tarea():
+        nonlocal errores
+        for i in pendientes:
+            t0 = time.perf_counter()
+            status = await pedir(i)
+            latencias.append(time.perf_counter() - t0)
+            if status >= 400:
+                errores += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(tarea() for _ in range(concurrencia)))
+    return resumir(latencias, errores, time.perf_counter() - t0)
+
+async def drive(endpoints, total, concurrencia):
+    resultados = {}
+    async with cliente() as c:
+        for url in endpoints:
+            async def pedir(i):
+                return (await c.get(url)).status_code
+
+            await pedir(0)  # warm up caches and the pool
+            resultados[url] = r = await medir(pedir, total, concurrencia)
+            print(f"{url:<40}{r['rps']:>9.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['errores']:>6}")
+    return resultados
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def comparar(base_path, nuevo_path):
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(nuevo_path) as f:
+        nuevo = json.load(f)
+    print(f"{'endpoint':<40}{'rps':>16}{'p50 ms':>18}{'p99 ms':>18}")
+    for url, b in base["resultados"].items():
+        n = nuevo["resultados"].get(url)
+        if not n:
+            continue
+        celdas = []
+        for clave in ("rps", "p50_ms", "p99_ms"):
+            delta = (n[clave] - b[clave]) / b[clave] * 100 if b[clave] else 0.0
+            celdas.append(f"{n[clave]:>9.1f} ({delta:+5.0f}%)")
+        print(f"{url:<40}" + "".join(f"{c:>18}" for c in celdas))
+
+def main():
+    from .datagen import ESCALAS, generar
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="base ya generada; si falta se crea una temporal")
+    parser.add_argument("--escala", choices=ESCALAS, default="chica")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--clientes", type=int, default=20, help="clientes concurrentes")
+    parser.add_argument("--requests", type=int, default=200, help="requests por endpoint")
+    parser.add_argument("--endpoint", action="append", help="endpoint a medir (repetible); por defecto todos")
+    parser.add_argument("--salida", help="archivo JSON con los resultados")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVO"), help="compara dos resultados y sale")
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+
+    # Before anything imports backend.database, which builds its engine from it
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ["DATABASE_URL"] = url
+    datos = None
+    if args.url is None:
+        print(f"Generando datos ({args.escala}) en {url}")
+        datos = generar(url, ESCALAS[args.escala], args.semilla)
+
+    print(f"{'endpoint':<40}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>6}")
+    t0 = time.perf_counter()
+    resultados = asyncio.run(drive(args.endpoint or ENDPOINTS, args.requests, args.clientes))
+    informe = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "plataforma": platform.platform(),
+        "config": {
+            "clientes": args.clientes, "requests": args.requests,
+            "escala": None if args.url else args.escala, "semilla": args.semilla,
+            "env": {k: os.environ[k] for k in CONFIG_VARS if k in os.environ},
+        },
+        "datos": datos,
+        "duracion_s": time.perf_counter() - t0,
+        "resultados": resultados,
+    }
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(informe, f, indent=2)
+        print(f"Resultados en {args.salida}")
+
+if __name__ == "__main__":
+    main()
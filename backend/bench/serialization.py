@@ -0,0 +1,102 @@
+"""Tiempo al primer byte y bytes transferidos de los listados grandes.
+
+Uso (desde la raíz del repo):
+
+    python -m backend.bench.serialization --rounds 50
+
+Genera una base de ejemplo con backend.bench.datagen y compara la
+serialización por defecto, FAST_JSON=1 y FAST_JSON=1 con compresión. Cada
+modo corre en un proceso aparte (la configuración se lee al importar) y
+llama a la app ASGI directamente, midiendo cuándo sale http.response.start
+y cuántos bytes de cuerpo se envían.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from .datagen import ESCALAS, generar
+
+ENDPOINTS = ["/api/pedidos/", "/api/clientes/", "/api/productos/", "/api/trabajos-fotocopia/"]
+
+MODES = {
+    "default": {"FAST_JSON": "0", "COMPRESSION_MIN_BYTES": "0"},
+    "fast": {"FAST_JSON": "1", "COMPRESSION_MIN_BYTES": "0"},
+    "fast+gzip": {"FAST_JSON": "1", "COMPRESSION_MIN_BYTES": "1024"},
+}
+
+async def llamar(app, path, headers, muestras):
+    """Un GET directo a la app ASGI; agrega (ttfb, bytes) a muestras."""
+    inicio = time.perf_counter()
+    primer_byte = None
+    status = None
+    enviados = 0
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"limit=500",
+        "root_path": "", "client": ("127.0.0.1", 1), "server": ("bench", 80),
+        "headers": [(b"host", b"bench"), *headers, (b"accept-encoding", b"gzip, br")],
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal primer_byte, status, enviados
+        if message["type"] == "http.response.start":
+            primer_byte = time.perf_counter() - inicio
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            enviados += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    muestras.append((primer_byte, enviados))
+    return status
+
+async def drive(rounds):
+    from ..main import app
+    from .run import encabezados, medir, percentil
+
+    headers = [(k.lower().encode(), v.encode()) for k, v in encabezados().items()]
+    resultados = {}
+    for path in ENDPOINTS:
+        await llamar(app, path, headers, [])  # warm up
+        muestras = []
+        r = await medir(lambda i: llamar(app, path, headers, muestras), rounds, 1)
+        if r["errores"]:
+            raise SystemExit(f"{path}: {r['errores']} respuestas con error")
+        resultados[path] = {
+            "ttfb_ms": percentil(sorted(m[0] for m in muestras), 0.50) * 1000,
+            "total_ms": r["p50_ms"],
+            "bytes": muestras[-1][1],
+        }
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(drive(args.rounds))))
+        return
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    generar(url, ESCALAS["chica"])
+    print(f"{'endpoint':<28}{'mode':<12}{'ttfb ms':>10}{'total ms':>10}{'bytes':>10}")
+    for mode, flags in MODES.items():
+        env = {**os.environ, "DATABASE_URL": url, **flags}
+        out = subprocess.run(
+            [sys.executable, "-m", "backend.bench.serialization", "--worker", "--rounds", str(args.rounds)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        for path, r in json.loads(out.strip().splitlines()[-1]).items():
+            print(f"{path:<28}{mode:<12}{r['ttfb_ms']:>10.1f}{r['total_ms']:>10.1f}{r['bytes']:>10}")
+
+if __name__ == "__main__":
+    main()
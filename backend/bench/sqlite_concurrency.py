@@ -0,0 +1,84 @@
+"""Compara la concurrencia de SQLite con y sin los PRAGMAs de database.py.
+
+Uso (desde la raíz del repo):
+
+    python -m backend.bench.sqlite_concurrency --seconds 5 --readers 8 --writers 4
+
+Cada configuración corre sobre una base temporal nueva: los lectores listan
+los últimos trabajos de fotocopia y los escritores insertan trabajos con su
+pago, cada uno en su propia transacción.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+
+from ..database import make_engine
+from .. import models
+
+def run(nombre, pragmas, seconds, readers, writers):
+    path = os.path.join(tempfile.mkdtemp(), f"{nombre}.db")
+    kwargs = {} if pragmas is None else {"pragmas": pragmas}
+    engine = make_engine(f"sqlite:///{path}", **kwargs)
+    models.Base.metadata.create_all(engine)
+    T, P = models.TrabajoFotocopia.__table__, models.PagoFotocopia.__table__
+
+    stats = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def count(key):
+        with lock:
+            stats[key] += 1
+
+    def reader():
+        q = select(T).order_by(T.c.id.desc()).limit(50)
+        while time.perf_counter() < stop:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(q).all()
+                count("reads")
+            except OperationalError:
+                count("errors")
+
+    def writer():
+        while time.perf_counter() < stop:
+            try:
+                with engine.begin() as conn:
+                    trabajo_id = conn.execute(insert(T).values(
+                        solicitante="bench", material="apunte", cantidad=1, precio=100,
+                        estado="pendiente", fecha=date(2024, 3, 1),
+                    )).inserted_primary_key[0]
+                    conn.execute(insert(P).values(trabajo_id=trabajo_id, monto=50, fecha=date(2024, 3, 1)))
+                count("writes")
+            except OperationalError:
+                count("errors")
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    engine.dispose()
+    return {k: v / seconds if k != "errors" else v for k, v in stats.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'config':<10}{'reads/s':>12}{'writes/s':>12}{'errors':>10}")
+    for nombre, pragmas in (("default", {}), ("tuned", None)):
+        r = run(nombre, pragmas, args.seconds, args.readers, args.writers)
+        print(f"{nombre:<10}{r['reads']:>12.0f}{r['writes']:>12.0f}{r['errors']:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import hashlib
+from typing import Callable
+
+from fastapi import Request, Response
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import insert_for
+from .respuestas import serializar
+
+# The catalogs (categorías, grados with their books, años with their
+# materials) change a few times a season but are fetched on every screen.
+# Each one has a version counter in versiones_catalogo that any ORM flush
+# touching its tables bumps inside the same transaction, so all worker
+# processes agree on it. The serialized body is kept per process next to the
+# version it was built from; a request whose If-None-Match matches gets a
+# 304 after a single primary-key read.
+CATALOGOS = {
+    models.Categoria: "categorias",
+    models.Grado: "grados",
+    models.LibroCatalogo: "grados",
+    models.AnioFotocopia: "anios_fotocopia",
+    models.MaterialCatalogo: "anios_fotocopia",
+}
+
+_cache = {}  # nombre -> (version, etag, body)
+
+def init_versiones(engine):
+    """Crea las filas de versión que falten."""
+    filas = [{"nombre": n, "version": 0} for n in sorted(set(CATALOGOS.values()))]
+    with engine.begin() as conn:
+        conn.execute(insert_for(models.VersionCatalogo).values(filas).on_conflict_do_nothing())
+
+@event.listens_for(Session, "before_flush")
+def _bump_versiones(session, flush_context, instances):
+    cambiados = {
+        CATALOGOS[type(obj)]
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if type(obj) in CATALOGOS and (obj not in session.dirty or session.is_modified(obj))
+    }
+    if cambiados:
+        V = models.VersionCatalogo
+        session.connection().execute(
+            update(V).where(V.nombre.in_(cambiados)).values(version=V.version + 1)
+        )
+
+def _coincide(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(t.strip().removeprefix("W/") == etag for t in if_none_match.split(","))
+
+def respuesta(request: Request, db: Session, nombre: str, schema, cargar: Callable[[], list]) -> Response:
+    """Devuelve el catálogo serializado con ETag, o 304 si el cliente ya lo tiene."""
+    # The version is read before the rows: a write committed in between
+    # leaves a newer body under an older version, which the next bump
+    # replaces, never an older body under the current version.
+    V = models.VersionCatalogo
+    version = db.execute(select(V.version).where(V.nombre == nombre)).scalar_one()
+    cacheado = _cache.get(nombre)
+    if cacheado is None or cacheado[0] != version:
+        body = serializar(schema, cargar())
+        etag = f'"{version}-{hashlib.sha256(body).hexdigest()[:16]}"'
+        cacheado = _cache[nombre] = (version, etag, body)
+    _, etag, body = cacheado
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _coincide(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
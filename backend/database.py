@@ -1,18 +1,127 @@
 import os
-from sqlalchemy import create_engine
+from typing import Optional
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'libreria.db')}"
+SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL", f"sqlite:///{os.path.join(BASE_DIR, 'libreria.db')}")
+if SQLALCHEMY_DATABASE_URL.startswith(("postgres://", "postgresql://")):
+    # Render and Heroku hand out "postgres://", which SQLAlchemy no longer
+    # accepts, and a bare "postgresql://" means psycopg 3 since SQLAlchemy
+    # 2.1: pin the driver requirements.txt installs
+    SQLALCHEMY_DATABASE_URL = "postgresql+psycopg2://" + SQLALCHEMY_DATABASE_URL.split("://", 1)[1]
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+# Applied to every new SQLite connection. WAL lets readers run while a write
+# is in progress, busy_timeout makes writers wait for the lock instead of
+# failing with "database is locked", and synchronous=NORMAL is safe under WAL.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 10000)),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "cache_size": -int(os.environ.get("SQLITE_CACHE_KB", 32 * 1024)),  # negative = KiB
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_BYTES", 256 * 1024 * 1024)),
+    "temp_store": os.environ.get("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+# Old archived pedidos are moved out of the hot tables (see archivo.py) into
+# the "archivo" schema: a separate file attached to every connection on
+# SQLite, so the main database and its backups stay small; a schema of the
+# same database on PostgreSQL (pg_dump -N archivo leaves it out).
+ARCHIVO_SCHEMA = "archivo"
+
+def archivo_path(database: Optional[str]) -> str:
+    """Archivo SQLite del archivo histórico: ARCHIVO_DB, o junto a la base principal."""
+    if os.environ.get("ARCHIVO_DB"):
+        return os.environ["ARCHIVO_DB"]
+    if not database or database == ":memory:":
+        return ":memory:"
+    raiz, ext = os.path.splitext(database)
+    return f"{raiz}-archivo{ext or '.db'}"
+
+# Sync endpoints run in Starlette's threadpool (40 threads by default), so
+# the pool can hand out that many connections before requests queue. On a
+# server database, pre-ping and recycle drop connections the server or a
+# proxy closed while they sat idle in the pool.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 30))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+
+def make_engine(url: str, pragmas: dict = SQLITE_PRAGMAS, **kwargs):
+    kwargs.setdefault("pool_size", DB_POOL_SIZE)
+    kwargs.setdefault("max_overflow", DB_MAX_OVERFLOW)
+    kwargs.setdefault("pool_timeout", DB_POOL_TIMEOUT)
+    if not url.startswith("sqlite"):
+        kwargs.setdefault("pool_pre_ping", True)
+        kwargs.setdefault("pool_recycle", DB_POOL_RECYCLE)
+        return create_engine(url, **kwargs)
+
+    engine = create_engine(url, connect_args={"check_same_thread": False}, **kwargs)
+    _set_sqlite_pragmas(engine, pragmas)
+    return engine
+
+def _set_sqlite_pragmas(engine, pragmas: dict):
+    archivo = archivo_path(engine.url.database)
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.execute(f"ATTACH DATABASE ? AS {ARCHIVO_SCHEMA}", (archivo,))
+        for name in ("journal_mode", "synchronous"):
+            if name in pragmas:
+                cursor.execute(f"PRAGMA {ARCHIVO_SCHEMA}.{name}={pragmas[name]}")
+        cursor.close()
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async mode (DB_ASYNC=1): the read-heavy list endpoints run as coroutines on
+# an async engine (aiosqlite / asyncpg) instead of holding a threadpool
+# thread for the whole database round trip. Writes stay on the sync engine.
+DB_ASYNC = os.environ.get("DB_ASYNC", "0") == "1"
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def make_async_engine(url: str, pragmas: dict = SQLITE_PRAGMAS, **kwargs):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    scheme, rest = url.split("://", 1)
+    url = f"{ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+    kwargs.setdefault("pool_size", DB_POOL_SIZE)
+    kwargs.setdefault("max_overflow", DB_MAX_OVERFLOW)
+    kwargs.setdefault("pool_timeout", DB_POOL_TIMEOUT)
+    if scheme.startswith("sqlite"):
+        engine = create_async_engine(url, **kwargs)
+        _set_sqlite_pragmas(engine.sync_engine, pragmas)
+        return engine
+    kwargs.setdefault("pool_pre_ping", True)
+    kwargs.setdefault("pool_recycle", DB_POOL_RECYCLE)
+    return create_async_engine(url, **kwargs)
+
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async_engine = make_async_engine(SQLALCHEMY_DATABASE_URL)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
+def insert_for(model):
+    """insert() del dialecto activo, con soporte de ON CONFLICT."""
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,97 @@
+import mimetypes
+import os
+from dataclasses import dataclass, field
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse, JSONResponse
+
+# The built frontend (frontend/dist) is scanned once at startup: each file
+# is recorded with its stat result and the precompressed siblings next to
+# it (app.js.br, app.js.gz), so serving a request is a dict lookup with no
+# filesystem probing. index.html is kept in memory. Vite fingerprints
+# everything under assets/, so those files are cached by browsers forever;
+# the rest must be revalidated.
+ASSETS_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+@dataclass
+class Archivo:
+    path: str
+    stat: os.stat_result
+    media_type: str
+    etag: str
+    cache_control: str
+    variantes: dict = field(default_factory=dict)  # encoding -> (path, stat)
+
+class Frontend:
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        self.archivos = {}
+        self.index = None
+        if os.path.isdir(directorio):
+            self._escanear()
+
+    def _escanear(self):
+        for raiz, _, nombres in os.walk(self.directorio):
+            for nombre in nombres:
+                if nombre.endswith((".br", ".gz")):
+                    continue
+                path = os.path.join(raiz, nombre)
+                rel = os.path.relpath(path, self.directorio).replace(os.sep, "/")
+                st = os.stat(path)
+                archivo = Archivo(
+                    path=path, stat=st,
+                    media_type=mimetypes.guess_type(nombre)[0] or "application/octet-stream",
+                    etag=f'"{st.st_mtime_ns:x}-{st.st_size:x}"',
+                    cache_control=ASSETS_CACHE if rel.startswith("assets/") else REVALIDATE_CACHE,
+                )
+                for encoding, sufijo in ENCODINGS:
+                    if os.path.isfile(path + sufijo):
+                        archivo.variantes[encoding] = (path + sufijo, os.stat(path + sufijo))
+                self.archivos[rel] = archivo
+        index = self.archivos.pop("index.html", None)
+        if index:
+            with open(index.path, "rb") as f:
+                self.index = (index, f.read())
+
+    def servir(self, path: str, request: Request) -> Response:
+        if self.index is None:
+            return JSONResponse({"message": "API Kiosco y Librería"} if not path else {"message": "Not found"})
+        archivo = self.archivos.get(path)
+        if archivo is None:
+            if path.startswith(("api/", "assets/")):
+                # A missing chunk must fail, not come back as index.html
+                return JSONResponse({"detail": "Not Found"}, status_code=404)
+            return self._index(request)
+        headers = {"ETag": archivo.etag, "Cache-Control": archivo.cache_control}
+        if archivo.variantes:
+            headers["Vary"] = "Accept-Encoding"
+        if request.headers.get("if-none-match") == archivo.etag:
+            return Response(status_code=304, headers=headers)
+        encoding = _elegir_encoding(request, archivo.variantes)
+        if encoding:
+            path_variante, st = archivo.variantes[encoding]
+            headers["Content-Encoding"] = encoding
+            return FileResponse(path_variante, stat_result=st, media_type=archivo.media_type, headers=headers)
+        return FileResponse(archivo.path, stat_result=archivo.stat, media_type=archivo.media_type, headers=headers)
+
+    def _index(self, request: Request) -> Response:
+        index, body = self.index
+        headers = {"ETag": index.etag, "Cache-Control": REVALIDATE_CACHE}
+        if request.headers.get("if-none-match") == index.etag:
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="text/html", headers=headers)
+
+def _elegir_encoding(request: Request, variantes: dict):
+    if not variantes:
+        return None
+    aceptadas = set()
+    for parte in request.headers.get("accept-encoding", "").split(","):
+        nombre, _, params = parte.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            aceptadas.add(nombre.strip().lower())
+    for encoding, _ in ENCODINGS:
+        if encoding in variantes and encoding in aceptadas:
+            return encoding
+    return None
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Live change feed. Endpoints call publicar(db, nombre, **datos) while they
+# work; the events wait in session.info and only reach the bus after the
+# transaction commits (a rollback discards them), so clients never hear
+# about changes that did not happen. The bus keeps the last EVENTOS_BUFFER
+# events in a ring buffer and /api/eventos streams them as Server-Sent
+# Events. Ids are "<epoch>-<n>" with a random epoch per process: a client
+# resuming with Last-Event-ID from before a restart, or from further back
+# than the buffer reaches, gets a "reset" event and must refetch.
+#
+# The bus lives in the process, so every terminal has to be connected to
+# the same worker (the deploy runs a single uvicorn worker).
+EVENTOS_BUFFER = int(os.environ.get("EVENTOS_BUFFER", 1000))
+KEEPALIVE_SEGUNDOS = float(os.environ.get("EVENTOS_KEEPALIVE", 15))
+
+@dataclass(frozen=True)
+class Evento:
+    n: int
+    nombre: str
+    datos: dict
+    ts: float
+
+class Bus:
+    def __init__(self, maxlen: int = EVENTOS_BUFFER):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.buffer = deque(maxlen=maxlen)
+        self.ultimo = 0
+        self.lock = threading.Lock()
+        self.suscriptores = set()  # (loop, asyncio.Event)
+
+    def publicar(self, eventos):
+        with self.lock:
+            for nombre, datos in eventos:
+                self.ultimo += 1
+                self.buffer.append(Evento(self.ultimo, nombre, datos, time.time()))
+            suscriptores = list(self.suscriptores)
+        # Publishers run in threadpool threads; wake each stream on its loop
+        for loop, despertar in suscriptores:
+            loop.call_soon_threadsafe(despertar.set)
+
+    def desde(self, n: int):
+        """Eventos posteriores a n, o None si ya no están en el buffer."""
+        with self.lock:
+            if n > self.ultimo or (self.buffer and n < self.buffer[0].n - 1):
+                return None
+            return [e for e in self.buffer if e.n > n]
+
+    def posicion(self, last_event_id: Optional[str]) -> Optional[int]:
+        """Traduce un Last-Event-ID a un número de este proceso (None = no se puede retomar)."""
+        if not last_event_id:
+            return self.ultimo
+        epoch, _, n = last_event_id.partition("-")
+        if epoch != self.epoch or not n.isdigit():
+            return None
+        return int(n)
+
+    def formatear(self, e: Evento) -> str:
+        datos = json.dumps({**e.datos, "evento": e.nombre, "ts": e.ts}, ensure_ascii=False)
+        return f"id: {self.epoch}-{e.n}\nevent: {e.nombre}\ndata: {datos}\n\n"
+
+    async def stream(self, last_event_id: Optional[str]):
+        loop = asyncio.get_running_loop()
+        despertar = asyncio.Event()
+        suscriptor = (loop, despertar)
+        with self.lock:
+            self.suscriptores.add(suscriptor)
+        try:
+            yield "retry: 3000\n\n"
+            n = self.posicion(last_event_id)
+            while True:
+                despertar.clear()
+                pendientes = self.desde(n) if n is not None else None
+                if pendientes is None:
+                    n = self.ultimo
+                    yield f"id: {self.epoch}-{n}\nevent: reset\ndata: {{}}\n\n"
+                    continue
+                for e in pendientes:
+                    yield self.formatear(e)
+                    n = e.n
+                try:
+                    await asyncio.wait_for(despertar.wait(), KEEPALIVE_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+        finally:
+            with self.lock:
+                self.suscriptores.discard(suscriptor)
+
+bus = Bus()
+
+def publicar(db: Session, nombre: str, **datos):
+    """Encola un evento que se emite cuando la sesión confirme."""
+    db.info.setdefault("eventos", []).append((nombre, datos))
+
+@event.listens_for(Session, "after_commit")
+def _emitir(session):
+    eventos = session.info.pop("eventos", None)
+    if eventos:
+        bus.publicar(eventos)
+
+@event.listens_for(Session, "after_rollback")
+def _descartar(session):
+    session.info.pop("eventos", None)
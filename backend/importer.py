@@ -0,0 +1,170 @@
+import codecs
+import csv
+import io
+import re
+import unicodedata
+from typing import Iterator, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Supplier price lists are imported in batches: each batch resolves the
+# existing products with two IN queries, then inserts and updates with one
+# executemany each and commits. Rows are read lazily from the upload, so
+# memory use depends on BATCH_SIZE and not on the size of the file.
+BATCH_SIZE = 1000
+MAX_ERRORES = 50
+
+COLUMNAS = {
+    "isbn": {"isbn", "codigo", "cod", "ean", "codigo de barras"},
+    "descripcion": {"descripcion", "titulo", "producto", "detalle", "articulo", "nombre"},
+    "costo_base": {"costo", "costo base", "costo_base", "precio", "precio costo", "precio_costo", "neto"},
+    "categoria": {"categoria", "rubro"},
+}
+
+class FormatoInvalido(ValueError):
+    pass
+
+def _normalizar(texto) -> str:
+    texto = unicodedata.normalize("NFD", str(texto or "")).encode("ascii", "ignore").decode()
+    return " ".join(texto.lower().replace("_", " ").split())
+
+def _mapear_encabezados(encabezados) -> dict:
+    mapa = {}
+    for i, nombre in enumerate(encabezados):
+        nombre = _normalizar(nombre)
+        for campo, alias in COLUMNAS.items():
+            if campo not in mapa and (nombre in alias or nombre.replace(" ", "_") in alias):
+                mapa[campo] = i
+    if "descripcion" not in mapa or "costo_base" not in mapa:
+        raise FormatoInvalido("El archivo debe tener columnas de descripción y costo")
+    return mapa
+
+def parse_importe(valor) -> float:
+    """Acepta 1234.5, "1.234,50", "$ 12.500" y "1,234.50"."""
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    s = re.sub(r"[^\d,.\-]", "", str(valor or ""))
+    if not s:
+        raise ValueError("costo vacío")
+    if "," in s and "." in s:
+        decimal = "," if s.rfind(",") > s.rfind(".") else "."
+        s = s.replace("." if decimal == "," else ",", "").replace(",", ".")
+    elif "," in s:
+        s = s.replace(",", ".")
+    elif re.fullmatch(r"-?\d{1,3}(\.\d{3})+", s):
+        s = s.replace(".", "")  # 12.500 is a thousands separator in our lists
+    return float(s)
+
+def _filas_csv(archivo) -> Iterator[list]:
+    muestra = archivo.read(64 * 1024)
+    archivo.seek(0)
+    try:
+        # The sample may end in the middle of a multibyte character
+        codecs.getincrementaldecoder("utf-8-sig")().decode(muestra, final=False)
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        encoding = "latin-1"  # Excel "CSV" exports
+    texto = muestra.decode(encoding, errors="ignore")
+    try:
+        dialecto = csv.Sniffer().sniff(texto, delimiters=";,\t|")
+    except csv.Error:
+        dialecto = csv.excel
+    yield from csv.reader(io.TextIOWrapper(archivo, encoding=encoding, newline=""), dialecto)
+
+def _filas_xlsx(archivo) -> Iterator[tuple]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise FormatoInvalido("Para importar planillas XLSX hay que instalar openpyxl")
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        yield from libro.active.iter_rows(values_only=True)
+    finally:
+        libro.close()
+
+def leer_filas(archivo, nombre: str) -> Iterator[tuple]:
+    """Itera (nº de fila, dict) con los campos reconocidos del archivo."""
+    filas = _filas_xlsx(archivo) if nombre.lower().endswith((".xlsx", ".xlsm")) else _filas_csv(archivo)
+    encabezados = next(filas, None)
+    if encabezados is None:
+        raise FormatoInvalido("El archivo está vacío")
+    mapa = _mapear_encabezados(encabezados)
+    for n, fila in enumerate(filas, start=2):
+        if not any(v not in (None, "") for v in fila):
+            continue
+        yield n, {campo: fila[i] if i < len(fila) else None for campo, i in mapa.items()}
+
+def importar_productos(db: Session, filas, calc_price, categoria_id: Optional[int] = None) -> dict:
+    categorias = {_normalizar(c.nombre): (c.id, c.margen_porcentaje) for c in db.query(models.Categoria)}
+    margenes = dict(categorias.values())
+    if categoria_id is not None and categoria_id not in margenes:
+        raise FormatoInvalido("Categoría por defecto inexistente")
+    resultado = {"insertados": 0, "actualizados": 0, "rechazados": 0, "errores": []}
+
+    def rechazar(n, motivo):
+        resultado["rechazados"] += 1
+        if len(resultado["errores"]) < MAX_ERRORES:
+            resultado["errores"].append({"fila": n, "motivo": motivo})
+
+    lote = {}
+    for n, datos in filas:
+        descripcion = str(datos.get("descripcion") or "").strip()
+        isbn = str(datos.get("isbn") or "").strip() or None
+        if isbn and isbn.endswith(".0"):
+            isbn = isbn[:-2]  # numeric ISBN cells read from XLSX
+        if not descripcion:
+            rechazar(n, "sin descripción"); continue
+        try:
+            costo = parse_importe(datos.get("costo_base"))
+        except ValueError:
+            rechazar(n, "costo inválido"); continue
+        cat_id = categoria_id
+        if datos.get("categoria"):
+            cat = categorias.get(_normalizar(datos["categoria"]))
+            if not cat:
+                rechazar(n, f"categoría desconocida: {datos['categoria']}"); continue
+            cat_id = cat[0]
+        if cat_id is None:
+            rechazar(n, "sin categoría"); continue
+        clave = ("isbn", isbn) if isbn else ("descripcion", descripcion)
+        if clave in lote:
+            # A repeated product in the batch: the later row wins, as if the
+            # rows ran one after another, so the earlier one counts as updated
+            resultado["actualizados"] += 1
+        lote[clave] = {
+            "isbn": isbn, "descripcion": descripcion, "costo_base": costo, "categoria_id": cat_id,
+            "precio_publico": calc_price(costo, margenes[cat_id]),
+        }
+        if len(lote) >= BATCH_SIZE:
+            _guardar_lote(db, lote, resultado); lote = {}
+    if lote:
+        _guardar_lote(db, lote, resultado)
+    return resultado
+
+def _guardar_lote(db: Session, lote: dict, resultado: dict):
+    P = models.Producto
+    isbns = [v for k, v in lote if k == "isbn"]
+    descripciones = [v for k, v in lote if k == "descripcion"]
+    existentes = {}
+    if isbns:
+        for id_, isbn in db.execute(select(P.id, P.isbn).where(P.isbn.in_(isbns)).order_by(P.id.desc())):
+            existentes[("isbn", isbn)] = id_
+    if descripciones:
+        q = select(P.id, P.descripcion).where(
+            P.descripcion.in_(descripciones), (P.isbn.is_(None)) | (P.isbn == "")
+        ).order_by(P.id.desc())
+        for id_, descripcion in db.execute(q):
+            existentes[("descripcion", descripcion)] = id_
+
+    nuevos = [fila for clave, fila in lote.items() if clave not in existentes]
+    cambios = [{**fila, "id": existentes[clave]} for clave, fila in lote.items() if clave in existentes]
+    if nuevos:
+        db.execute(insert(P), nuevos)
+    if cambios:
+        db.execute(update(P), cambios)
+    db.commit()
+    resultado["insertados"] += len(nuevos)
+    resultado["actualizados"] += len(cambios)
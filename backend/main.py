@@ -1,33 +1,64 @@
-from fastapi import FastAPI, Depends, HTTPException, APIRouter, status
+from fastapi import FastAPI, Depends, HTTPException, APIRouter, File, Form, Header, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from .auth import get_current_user, create_access_token, get_password_hash, verify_password
+from .auth import (
+    get_current_user, create_access_token, decode_token, get_password_hash, verify_password, password_needs_rehash,
+    login_retry_after, register_login_failure, clear_login_failures,
+)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from typing import List
-import math
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+from sqlalchemy import and_, bindparam, case, func, insert, or_, select, update
+from jose import JWTError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
+from collections import Counter, defaultdict
+from datetime import date
+import hmac
 import os
 
-from . import models, schemas
-from .database import engine, get_db
+from . import archivo, catalogo, estaticos, eventos, importer, metricas, migrations, models, personas, reportes, respuestas, schemas, search as fts, sync
+from .database import DB_ASYNC, engine, get_db, insert_for
+from .precios import calc_price, centavos, reprice
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, entre_fechas, paginate
 
 models.Base.metadata.create_all(bind=engine)
+migrations.upgrade(engine, models.Base.metadata)
+fts.init_fts(engine)
+personas.init_indice(engine)
+catalogo.init_versiones(engine)
+sync.purgar_bajas(engine)
+reportes.backfill(engine)
 
 
 app = FastAPI(title="Panel de Gestión - Kiosco y Librería API")
+app.router.route_class = metricas.RutaMedida
+metricas.instrumentar(engine)
 
-api_router = APIRouter(dependencies=[Depends(get_current_user)])
+api_router = APIRouter(dependencies=[Depends(get_current_user)], route_class=metricas.RutaMedida)
 
 @app.post("/api/token")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    ip = request.client.host if request.client else ""
+    espera = login_retry_after(form_data.username, ip)
+    if espera:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiados intentos fallidos, probá de nuevo en unos minutos",
+            headers={"Retry-After": str(espera)},
+        )
     user = db.query(models.Usuario).filter(models.Usuario.username == form_data.username).first()
     if not user or not verify_password(form_data.password, user.hashed_password):
+        register_login_failure(form_data.username, ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuario o contraseña incorrectos",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    clear_login_failures(form_data.username, ip)
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = get_password_hash(form_data.password)
+        db.commit()
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -40,6 +71,12 @@ def create_admin():
         db.add(new_admin)
         db.commit()
 
+@app.on_event("startup")
+def backfill_precios():
+    db = next(get_db())
+    reprice(db, models.Producto.precio_publico.is_(None))
+    db.commit()
+
 
 app.add_middleware(
     CORSMiddleware,
@@ -47,24 +84,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-After-Id"],
 )
+respuestas.add_compression(app)
+app.add_middleware(metricas.MetricasMiddleware)
+# Behind Render's proxy request.client is the proxy itself: take the client
+# from X-Forwarded-For, or the login throttle would count everyone as one IP.
+# Same variable (and default) as uvicorn's --forwarded-allow-ips.
+app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1"))
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    # Route latencies and slow SQL are not public: a scraper presents
+    # METRICS_TOKEN, anyone else a logged-in user's token
+    token = request.headers.get("authorization", "").removeprefix("Bearer ")
+    if not (metricas.METRICS_TOKEN and hmac.compare_digest(token, metricas.METRICS_TOKEN)):
+        try:
+            decode_token(token)
+        except JWTError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, headers={"WWW-Authenticate": "Bearer"})
+    return Response(metricas.registro.exponer(), media_type="text/plain; version=0.0.4")
 
 # Serve frontend static files
 FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend", "dist")
-if os.path.isdir(FRONTEND_DIR):
-    app.mount("/assets", StaticFiles(directory=os.path.join(FRONTEND_DIR, "assets")), name="assets")
-
-@app.get("/")
-def read_root():
-    if os.path.isdir(FRONTEND_DIR):
-        return FileResponse(os.path.join(FRONTEND_DIR, "index.html"))
-    return {"message": "API Kiosco y Librería"}
+frontend = estaticos.Frontend(FRONTEND_DIR)
 
 # ==================== BUSCADOR (Categorías y Productos) ====================
 
 @api_router.get("/categorias/", response_model=List[schemas.Categoria])
-def list_categorias(db: Session = Depends(get_db)):
-    return db.query(models.Categoria).all()
+def list_categorias(request: Request, db: Session = Depends(get_db)):
+    return catalogo.respuesta(request, db, "categorias", schemas.Categoria, db.query(models.Categoria).all)
 
 @api_router.post("/categorias/", response_model=schemas.Categoria)
 def create_categoria(cat: schemas.CategoriaCreate, db: Session = Depends(get_db)):
@@ -76,10 +125,27 @@ def create_categoria(cat: schemas.CategoriaCreate, db: Session = Depends(get_db)
 def update_categoria(id: int, cat: schemas.CategoriaCreate, db: Session = Depends(get_db)):
     obj = db.query(models.Categoria).get(id)
     if not obj: raise HTTPException(404, "Categoría no encontrada")
+    margen_anterior = obj.margen_porcentaje
     for k, v in cat.model_dump().items(): setattr(obj, k, v)
+    if obj.margen_porcentaje != margen_anterior:
+        db.flush()
+        reprice(db, models.Producto.categoria_id == id)
     db.commit(); db.refresh(obj)
     return obj
 
+@api_router.post("/categorias/aumento-costos")
+def aumentar_costos(a: schemas.AumentoCostos, db: Session = Depends(get_db)):
+    """Aplica un aumento porcentual al costo de todas las categorías indicadas."""
+    en_categorias = models.Producto.categoria_id.in_(a.categoria_ids)
+    result = db.execute(
+        update(models.Producto).where(en_categorias)
+        .values(costo_base=centavos(models.Producto.costo_base * (1 + a.porcentaje / 100)))
+        .execution_options(synchronize_session=False)
+    )
+    reprice(db, en_categorias)
+    db.commit()
+    return {"ok": True, "actualizados": result.rowcount}
+
 @api_router.delete("/categorias/{id}")
 def delete_categoria(id: int, db: Session = Depends(get_db)):
     obj = db.query(models.Categoria).get(id)
@@ -87,41 +153,41 @@ def delete_categoria(id: int, db: Session = Depends(get_db)):
     db.delete(obj); db.commit()
     return {"ok": True}
 
-def calc_price(costo: float, margen: float) -> float:
-    return math.ceil(costo * (1 + margen / 100))
-
 @api_router.get("/productos/", response_model=List[schemas.Producto])
-def list_productos(search: str = "", db: Session = Depends(get_db)):
+def list_productos(response: Response, search: str = "", after_id: Optional[int] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db: Session = Depends(get_db)):
     q = db.query(models.Producto)
     if search:
-        q = q.filter(
-            (models.Producto.isbn.ilike(f"%{search}%")) |
-            (models.Producto.descripcion.ilike(f"%{search}%"))
-        )
-    productos = q.all()
-    for p in productos:
-        if p.categoria:
-            p.precio_publico = calc_price(p.costo_base, p.categoria.margen_porcentaje)
-        else:
-            p.precio_publico = p.costo_base
-    return productos
+        # Indexed prefix search ranked by relevance; `limit` caps the results
+        items = fts.filter_productos(q, models.Producto, search, engine.dialect.name).limit(limit).all()
+        return respuestas.lista(schemas.Producto, items, response)
+    items = paginate(q, models.Producto, response, after_id, limit)
+    return respuestas.lista(schemas.Producto, items, response)
 
 @api_router.post("/productos/", response_model=schemas.Producto)
 def create_producto(prod: schemas.ProductoCreate, db: Session = Depends(get_db)):
     obj = models.Producto(**prod.model_dump())
-    db.add(obj); db.commit(); db.refresh(obj)
-    if obj.categoria:
-        obj.precio_publico = calc_price(obj.costo_base, obj.categoria.margen_porcentaje)
+    db.add(obj); db.flush()
+    reprice(db, models.Producto.id == obj.id)
+    db.commit(); db.refresh(obj)
     return obj
 
+@api_router.post("/productos/importar")
+def importar_productos(archivo: UploadFile = File(...), categoria_id: Optional[int] = Form(None), db: Session = Depends(get_db)):
+    """Importa una lista de precios CSV/XLSX: actualiza por ISBN (o descripción) e inserta el resto."""
+    try:
+        filas = importer.leer_filas(archivo.file, archivo.filename or "")
+        return importer.importar_productos(db, filas, calc_price, categoria_id)
+    except importer.FormatoInvalido as e:
+        raise HTTPException(400, str(e))
+
 @api_router.put("/productos/{id}", response_model=schemas.Producto)
 def update_producto(id: int, prod: schemas.ProductoCreate, db: Session = Depends(get_db)):
     obj = db.query(models.Producto).get(id)
     if not obj: raise HTTPException(404)
     for k, v in prod.model_dump().items(): setattr(obj, k, v)
+    db.flush()
+    reprice(db, models.Producto.id == id)
     db.commit(); db.refresh(obj)
-    if obj.categoria:
-        obj.precio_publico = calc_price(obj.costo_base, obj.categoria.margen_porcentaje)
     return obj
 
 @api_router.delete("/productos/{id}")
@@ -134,8 +200,9 @@ def delete_producto(id: int, db: Session = Depends(get_db)):
 # ==================== ENCARGOS — Catálogo por Grado ====================
 
 @api_router.get("/grados/", response_model=List[schemas.Grado])
-def list_grados(db: Session = Depends(get_db)):
-    return db.query(models.Grado).all()
+def list_grados(request: Request, db: Session = Depends(get_db)):
+    consulta = db.query(models.Grado).options(selectinload(models.Grado.libros))
+    return catalogo.respuesta(request, db, "grados", schemas.Grado, consulta.all)
 
 @api_router.post("/grados/", response_model=schemas.Grado)
 def create_grado(g: schemas.GradoCreate, db: Session = Depends(get_db)):
@@ -183,35 +250,74 @@ def delete_libro_catalogo(id: int, db: Session = Depends(get_db)):
 
 # ==================== ENCARGOS — Pedidos ====================
 
+# schemas.Pedido serializes both collections, load them with one query each
+PEDIDO_LOAD = (selectinload(models.Pedido.libros), selectinload(models.Pedido.pagos))
+
 @api_router.get("/pedidos/", response_model=List[schemas.Pedido])
-def list_pedidos(db: Session = Depends(get_db)):
-    return db.query(models.Pedido).filter(models.Pedido.archivado == False).all()
+def list_pedidos(response: Response, desde: Optional[date] = None, hasta: Optional[date] = None, after_id: Optional[int] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db: Session = Depends(get_db)):
+    q = db.query(models.Pedido).options(*PEDIDO_LOAD).filter(models.Pedido.archivado == False, *entre_fechas(models.Pedido.fecha, desde, hasta))
+    items = paginate(q, models.Pedido, response, after_id, limit)
+    return respuestas.lista(schemas.Pedido, items, response)
 
 @api_router.get("/pedidos/archivados/", response_model=List[schemas.Pedido])
-def list_pedidos_archivados(db: Session = Depends(get_db)):
-    return db.query(models.Pedido).filter(models.Pedido.archivado == True).all()
+def list_pedidos_archivados(response: Response, desde: Optional[date] = None, hasta: Optional[date] = None, after_id: Optional[int] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db: Session = Depends(get_db)):
+    q = db.query(models.Pedido).options(*PEDIDO_LOAD).filter(models.Pedido.archivado == True, *entre_fechas(models.Pedido.fecha, desde, hasta))
+    items = paginate(q, models.Pedido, response, after_id, limit)
+    return respuestas.lista(schemas.Pedido, items, response)
+
+@api_router.get("/pedidos/vencidos/", response_model=List[schemas.Pedido])
+def list_pedidos_vencidos(response: Response, al: Optional[date] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db: Session = Depends(get_db)):
+    """Pedidos abiertos con la fecha tentativa vencida (al día `al`, por defecto hoy), los más atrasados primero."""
+    P = models.Pedido
+    q = db.query(P).options(*PEDIDO_LOAD).filter(P.archivado == False, P.fecha_tentativa < (al or date.today()))
+    items = q.order_by(P.fecha_tentativa, P.id).limit(limit).all()
+    return respuestas.lista(schemas.Pedido, items, response)
 
 @api_router.post("/pedidos/", response_model=schemas.Pedido)
 def create_pedido(p: schemas.PedidoCreate, db: Session = Depends(get_db)):
+    pedido = crear_pedido(db, p)
+    db.commit(); db.refresh(pedido)
+    return pedido
+
+@api_router.post("/grados/{grado_id}/pedidos/", response_model=schemas.Pedido)
+def create_pedido_desde_grado(grado_id: int, d: schemas.PedidoDesdeGrado, db: Session = Depends(get_db)):
+    """Crea un pedido con los libros del pack del grado, salvo los excluidos."""
+    if not db.get(models.Grado, grado_id): raise HTTPException(404)
+    libros = db.query(models.LibroCatalogo).filter(
+        models.LibroCatalogo.grado_id == grado_id, models.LibroCatalogo.id.not_in(d.excluir)
+    ).order_by(models.LibroCatalogo.id).all()
+    if not libros: raise HTTPException(400, "El pack no tiene libros para pedir")
+    p = schemas.PedidoCreate(
+        **d.model_dump(exclude={"excluir"}),
+        libros=[schemas.LibroPedidoCreate(titulo=l.titulo, precio=l.precio) for l in libros],
+    )
+    pedido = crear_pedido(db, p)
+    db.commit(); db.refresh(pedido)
+    return pedido
+
+def crear_pedido(db: Session, p: schemas.PedidoCreate) -> models.Pedido:
+    """Agrega el pedido con sus libros y seña sin confirmar la transacción.
+
+    Usa la misma cantidad de sentencias sin importar cuántos libros tenga:
+    los libros se insertan con un único executemany y los placeholders de
+    stock con un único INSERT ... ON CONFLICT DO NOTHING.
+    """
     pedido = models.Pedido(cliente=p.cliente, telefono=p.telefono, fecha=p.fecha, fecha_tentativa=p.fecha_tentativa)
-    db.add(pedido); db.flush()
-    for l in p.libros:
-        db.add(models.LibroPedido(**l.model_dump(), pedido_id=pedido.id))
-        # Ensure 0-stock entry exists for tracking
-        existing_stock = db.query(models.StockLibro).filter(
-            models.StockLibro.titulo == l.titulo, models.StockLibro.tipo == "nuevo"
-        ).first()
-        if not existing_stock:
-            db.add(models.StockLibro(titulo=l.titulo, isbn=l.isbn, tipo="nuevo", cantidad=0))
     if p.sena > 0:
-        db.add(models.PagoPedido(pedido_id=pedido.id, monto=p.sena, fecha=p.fecha, nota="Seña inicial"))
-    db.commit(); db.refresh(pedido)
+        pedido.pagos.append(models.PagoPedido(monto=p.sena, fecha=p.fecha, nota=reportes.NOTA_SENA))
+    db.add(pedido); db.flush()
+    if p.libros:
+        db.execute(insert(models.LibroPedido), [{**l.model_dump(), "pedido_id": pedido.id} for l in p.libros])
+        # Ensure 0-stock entries exist for tracking
+        asegurar_stock(db, [(l.titulo, l.isbn) for l in p.libros])
+    eventos.publicar(db, "pedido.creado", id=pedido.id)
     return pedido
 
 @api_router.delete("/pedidos/{id}")
 def delete_pedido(id: int, db: Session = Depends(get_db)):
     obj = db.query(models.Pedido).get(id)
     if not obj: raise HTTPException(404)
+    eventos.publicar(db, "pedido.eliminado", id=id)
     db.delete(obj); db.commit()
     return {"ok": True}
 
@@ -222,83 +328,187 @@ def add_libro_pedido(pedido_id: int, libro: schemas.LibroPedidoCreate, db: Sessi
     obj = models.LibroPedido(**libro.model_dump(), pedido_id=pedido_id)
     db.add(obj)
     # Ensure 0-stock entry exists for tracking
-    existing_stock = db.query(models.StockLibro).filter(
-        models.StockLibro.titulo == libro.titulo, models.StockLibro.tipo == "nuevo"
-    ).first()
-    if not existing_stock:
-        db.add(models.StockLibro(titulo=libro.titulo, isbn=libro.isbn, tipo="nuevo", cantidad=0))
+    asegurar_stock(db, [(libro.titulo, libro.isbn)])
+    eventos.publicar(db, "libro_pedido.agregado", pedido_id=pedido_id, titulo=libro.titulo)
     db.commit(); db.refresh(obj)
     return obj
 
 @api_router.put("/libros-pedido/{id}/estado")
 def update_libro_estado(id: int, estado: str, db: Session = Depends(get_db)):
-    obj = db.query(models.LibroPedido).get(id)
-    if not obj: raise HTTPException(404)
-    
-    # Decrease stock if moved to 'entregado'
-    if estado == "entregado" and obj.estado != "entregado":
-        stock = db.query(models.StockLibro).filter(
-            models.StockLibro.titulo == obj.titulo,
-            models.StockLibro.tipo == "nuevo"
-        ).first()
-        if stock and stock.cantidad > 0:
-            stock.cantidad -= 1
-            
-    # Increase stock if moved back from 'entregado'
-    elif obj.estado == "entregado" and estado != "entregado":
-        stock = db.query(models.StockLibro).filter(
-            models.StockLibro.titulo == obj.titulo,
-            models.StockLibro.tipo == "nuevo"
-        ).first()
-        if stock:
-            stock.cantidad += 1
+    archivados = aplicar_estados(db, {id: estado})
+    db.commit()
+    return {"ok": True, "estado": estado, "archivado": next(iter(archivados.values()))}
 
-    obj.estado = estado
-    db.commit(); db.refresh(obj)
-    
-    # Auto-archive order if all books are 'entregado'
-    pedido = obj.pedido
-    todos_entregados = all(l.estado == "entregado" for l in pedido.libros)
-    if todos_entregados and not pedido.archivado:
-        pedido.archivado = True
-        db.commit()
-    elif not todos_entregados and pedido.archivado:
-        pedido.archivado = False
-        db.commit()
-        
-    return {"ok": True, "estado": obj.estado, "archivado": pedido.archivado}
+@api_router.put("/libros-pedido/estado")
+def update_libros_estado(cambios: List[schemas.CambioEstado], db: Session = Depends(get_db)):
+    """Cambia el estado de varios libros de pedido en una sola transacción."""
+    archivados = aplicar_estados(db, {c.id: c.estado for c in cambios})
+    db.commit()
+    return {
+        "ok": True,
+        "actualizados": len(cambios),
+        "pedidos": [{"id": pid, "archivado": arch} for pid, arch in archivados.items()],
+    }
+
+def aplicar_estados(db: Session, cambios: dict) -> dict:
+    """Aplica {libro_pedido_id: estado} con SQL por lotes.
+
+    Ajusta el stock 'nuevo' por título (entregar descuenta sin bajar de cero,
+    volver atrás una entrega suma), actualiza los estados y recalcula
+    Pedido.archivado de los pedidos afectados con una sola consulta
+    agregada. Devuelve {pedido_id: archivado}; no confirma la transacción.
+    """
+    if not cambios:
+        return {}
+    L, S = models.LibroPedido.__table__, models.StockLibro.__table__
+    # Each transition is a conditional UPDATE and stock only moves for the
+    # rows it returns: when two clerks deliver the same book at once, the
+    # second UPDATE waits for the first and then no longer matches.
+    por_estado = defaultdict(list)
+    for id_, estado in cambios.items():
+        por_estado[estado].append(id_)
+    delta = Counter()
+    for estado, ids in por_estado.items():
+        cambiar = update(L).where(L.c.id.in_(ids)).values(estado=estado)
+        if estado == "entregado":
+            for titulo in db.scalars(cambiar.where(L.c.estado.is_distinct_from(estado)).returning(L.c.titulo)).all():
+                delta[titulo] -= 1
+            continue
+        for titulo in db.scalars(cambiar.where(L.c.estado == "entregado").returning(L.c.titulo)).all():
+            delta[titulo] += 1
+        db.execute(cambiar.where(L.c.estado.is_distinct_from(estado)))
+
+    # After the writes, so SQLite takes its write lock before reading
+    actuales = db.execute(select(L.c.id, L.c.pedido_id).where(L.c.id.in_(cambios))).all()
+    faltantes = set(cambios) - {r.id for r in actuales}
+    if faltantes: raise HTTPException(404, f"Libros de pedido inexistentes: {sorted(faltantes)}")
+
+    n = bindparam("b_n")
+    entregas = [{"b_titulo": t, "b_n": -d} for t, d in delta.items() if d < 0]
+    devoluciones = [{"b_titulo": t, "b_n": d} for t, d in delta.items() if d > 0]
+    stock = update(S).where(S.c.titulo == bindparam("b_titulo"), S.c.tipo == "nuevo")
+    if entregas:
+        db.execute(stock.values(cantidad=case((S.c.cantidad > n, S.c.cantidad - n), else_=0)), entregas)
+    if devoluciones:
+        db.execute(stock.values(cantidad=S.c.cantidad + n), devoluciones)
+    for titulo in delta:
+        eventos.publicar(db, "stock.cambiado", titulo=titulo, tipo="nuevo")
+
+    # Auto-archive orders whose books are all 'entregado' (and un-archive the rest)
+    P = models.Pedido.__table__
+    pedido_ids = {r.pedido_id for r in actuales}
+    pendientes = (
+        select(func.count()).select_from(L)
+        .where(L.c.pedido_id == P.c.id, L.c.estado != "entregado")
+        .scalar_subquery()
+    )
+    db.execute(update(P).where(P.c.id.in_(pedido_ids)).values(archivado=pendientes == 0))
+    archivados = dict(db.execute(select(P.c.id, P.c.archivado).where(P.c.id.in_(pedido_ids))).all())
+    for r in actuales:
+        eventos.publicar(db, "libro_pedido.estado", id=r.id, pedido_id=r.pedido_id, estado=cambios[r.id])
+    for pedido_id, archivado in archivados.items():
+        eventos.publicar(db, "pedido.archivado", id=pedido_id, archivado=archivado)
+    return archivados
 
 @api_router.post("/pedidos/{pedido_id}/pagos/", response_model=schemas.PagoPedido)
 def add_pago_pedido(pedido_id: int, pago: schemas.PagoPedidoCreate, db: Session = Depends(get_db)):
     pedido = db.query(models.Pedido).get(pedido_id)
     if not pedido: raise HTTPException(404)
     obj = models.PagoPedido(**pago.model_dump(), pedido_id=pedido_id)
+    eventos.publicar(db, "pago_pedido.creado", pedido_id=pedido_id, monto=pago.monto)
     db.add(obj); db.commit(); db.refresh(obj)
     return obj
 
+# ==================== ENCARGOS — Archivo histórico ====================
+
+ARCHIVO_LOAD = (selectinload(models.PedidoArchivo.libros), selectinload(models.PedidoArchivo.pagos))
+
+@api_router.get("/archivo/pedidos/", response_model=List[schemas.Pedido])
+def list_archivo(response: Response, search: str = "", desde: Optional[date] = None, hasta: Optional[date] = None, after_id: Optional[int] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db: Session = Depends(get_db)):
+    A = models.PedidoArchivo
+    q = db.query(A).options(*ARCHIVO_LOAD).filter(*entre_fechas(A.fecha, desde, hasta))
+    if search:
+        q = q.filter(A.cliente.ilike(f"%{search}%"))
+    items = paginate(q, A, response, after_id, limit)
+    return respuestas.lista(schemas.Pedido, items, response)
+
+@api_router.post("/archivo/pedidos/{id}/restaurar", response_model=schemas.Pedido)
+def restaurar_pedido(id: int, db: Session = Depends(get_db)):
+    try:
+        restaurado = archivo.restaurar(db, id)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(409, "El pedido usa ids que ya están ocupados en las tablas activas")
+    if not restaurado: raise HTTPException(404)
+    eventos.publicar(db, "pedido.restaurado", id=id)
+    db.commit()
+    return db.query(models.Pedido).options(*PEDIDO_LOAD).filter(models.Pedido.id == id).one()
+
+@api_router.post("/archivo/archivar")
+def archivar_pedidos(dias: int = Query(archivo.ARCHIVO_DIAS, ge=0), db: Session = Depends(get_db)):
+    """Mueve al archivo los pedidos archivados sin cambios hace más de `dias` días."""
+    movidos = archivo.archivar(db, dias)
+    if movidos:
+        eventos.publicar(db, "pedido.movido_al_archivo", cantidad=movidos)
+        db.commit()
+    return {"ok": True, "movidos": movidos}
+
 # ==================== ENCARGOS — Stock ====================
 
+# stock_libros has a unique (titulo, tipo) key, so every quantity change is
+# a single atomic statement instead of a SELECT followed by `cantidad += n`.
+
+def sumar_stock(db: Session, titulo: str, tipo: str, cantidad: int, isbn: Optional[str] = None):
+    """Suma stock (creando la fila si no existe). Devuelve (id, cantidad resultante)."""
+    S = models.StockLibro
+    stmt = insert_for(S).values(titulo=titulo, tipo=tipo, isbn=isbn, cantidad=cantidad)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[S.titulo, S.tipo],
+        set_={
+            "cantidad": S.cantidad + stmt.excluded.cantidad,
+            "isbn": func.coalesce(S.isbn, stmt.excluded.isbn),
+            "updated_at": models.ahora(),  # onupdate doesn't reach ON CONFLICT
+        },
+    ).returning(S.id, S.cantidad)
+    stock_id, total = db.execute(stmt).one()
+    eventos.publicar(db, "stock.cambiado", id=stock_id, titulo=titulo, tipo=tipo, cantidad=total)
+    return stock_id, total
+
+def asegurar_stock(db: Session, libros):
+    """Crea en un solo INSERT las filas de stock en 0 que falten para [(titulo, isbn)]."""
+    filas = {}
+    for titulo, isbn in libros:
+        if not filas.get(titulo):
+            filas[titulo] = isbn
+    if not filas:
+        return
+    valores = [{"titulo": t, "isbn": i, "tipo": "nuevo", "cantidad": 0} for t, i in filas.items()]
+    stmt = insert_for(models.StockLibro).values(valores)
+    db.execute(stmt.on_conflict_do_nothing(index_elements=["titulo", "tipo"]))
+
+def mover_stock(db: Session, titulo: str, delta: int, tipo: str = "nuevo"):
+    """Ajusta el stock en `delta`; los descuentos sólo se aplican si alcanza."""
+    S = models.StockLibro
+    stmt = update(S).where(S.titulo == titulo, S.tipo == tipo)
+    if delta < 0:
+        stmt = stmt.where(S.cantidad >= -delta)
+    result = db.execute(stmt.values(cantidad=S.cantidad + delta).execution_options(synchronize_session=False))
+    if result.rowcount:
+        eventos.publicar(db, "stock.cambiado", titulo=titulo, tipo=tipo)
+    return result.rowcount
+
 @api_router.get("/stock/", response_model=List[schemas.StockLibro])
-def list_stock(db: Session = Depends(get_db)):
-    return db.query(models.StockLibro).all()
+def list_stock(response: Response, after_id: Optional[int] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db: Session = Depends(get_db)):
+    items = paginate(db.query(models.StockLibro), models.StockLibro, response, after_id, limit)
+    return respuestas.lista(schemas.StockLibro, items, response)
 
 @api_router.post("/stock/")
 def create_stock(s: schemas.StockLibroCreate, db: Session = Depends(get_db)):
-    # Check if title+type combo exists
-    existing = db.query(models.StockLibro).filter(
-        models.StockLibro.titulo == s.titulo, models.StockLibro.tipo == s.tipo
-    ).first()
-    if existing:
-        existing.cantidad += s.cantidad
-        stock_obj = existing
-    else:
-        stock_obj = models.StockLibro(**s.model_dump())
-        db.add(stock_obj)
-        db.flush()
+    stock_id, disponible = sumar_stock(db, s.titulo, s.tipo, s.cantidad, s.isbn)
 
     # Auto-assign to pending orders (oldest first)
     asignados = 0
-    if stock_obj.cantidad > 0:
+    if disponible > 0:
         pending_libros = (
             db.query(models.LibroPedido)
             .join(models.Pedido)
@@ -307,18 +517,19 @@ def create_stock(s: schemas.StockLibroCreate, db: Session = Depends(get_db)):
                 models.LibroPedido.estado.in_(["faltante", "pedido"]),
                 models.Pedido.archivado == False
             )
-            .order_by(models.Pedido.fecha.asc())
+            .order_by(models.Pedido.fecha.asc(), models.Pedido.id.asc())
+            .limit(disponible)
             .all()
         )
         for libro in pending_libros:
-            if stock_obj.cantidad <= 0:
-                break
             libro.estado = "en_local"
-            stock_obj.cantidad -= 1
-            asignados += 1
+            eventos.publicar(db, "libro_pedido.estado", id=libro.id, pedido_id=libro.pedido_id, estado=libro.estado)
+        asignados = len(pending_libros)
+        if asignados:
+            mover_stock(db, s.titulo, -asignados, s.tipo)
 
     db.commit()
-    db.refresh(stock_obj)
+    stock_obj = db.get(models.StockLibro, stock_id)
     return {
         "id": stock_obj.id,
         "titulo": stock_obj.titulo,
@@ -333,14 +544,21 @@ def update_stock(id: int, s: schemas.StockLibroCreate, db: Session = Depends(get
     obj = db.query(models.StockLibro).get(id)
     if not obj: raise HTTPException(404)
     for k, v in s.model_dump().items(): setattr(obj, k, v)
-    db.commit(); db.refresh(obj)
+    eventos.publicar(db, "stock.cambiado", id=id, titulo=obj.titulo, tipo=obj.tipo, cantidad=obj.cantidad)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(409, "Ya existe stock con ese título y tipo")
+    db.refresh(obj)
     return obj
 
 # ==================== FOTOCOPIAS — Catálogo ====================
 
 @api_router.get("/anios-fotocopia/", response_model=List[schemas.AnioFotocopia])
-def list_anios(db: Session = Depends(get_db)):
-    return db.query(models.AnioFotocopia).all()
+def list_anios(request: Request, db: Session = Depends(get_db)):
+    consulta = db.query(models.AnioFotocopia).options(selectinload(models.AnioFotocopia.materiales))
+    return catalogo.respuesta(request, db, "anios_fotocopia", schemas.AnioFotocopia, consulta.all)
 
 @api_router.post("/anios-fotocopia/", response_model=schemas.AnioFotocopia)
 def create_anio(a: schemas.AnioFotocopiaCreate, db: Session = Depends(get_db)):
@@ -389,13 +607,87 @@ def delete_material(id: int, db: Session = Depends(get_db)):
 # ==================== FOTOCOPIAS — Trabajos ====================
 
 @api_router.get("/trabajos-fotocopia/", response_model=List[schemas.TrabajoFotocopia])
-def list_trabajos(db: Session = Depends(get_db)):
-    return db.query(models.TrabajoFotocopia).all()
+def list_trabajos(response: Response, desde: Optional[date] = None, hasta: Optional[date] = None, after_id: Optional[int] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db: Session = Depends(get_db)):
+    q = db.query(models.TrabajoFotocopia).options(selectinload(models.TrabajoFotocopia.pagos))
+    q = q.filter(*entre_fechas(models.TrabajoFotocopia.fecha, desde, hasta))
+    items = paginate(q, models.TrabajoFotocopia, response, after_id, limit)
+    return respuestas.lista(schemas.TrabajoFotocopia, items, response)
+
+ESTADOS_TRABAJO = ("pendiente", "listo", "entregado")
+
+@api_router.get("/trabajos-fotocopia/cola", response_model=List[schemas.TrabajoFotocopia])
+def cola_trabajos(response: Response, estado: str = "pendiente", after_id: Optional[int] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db: Session = Depends(get_db)):
+    """Trabajos en un estado, los más viejos primero (fecha, id), por el índice (estado, fecha).
+
+    Pagina con after_id / X-Next-After-Id como los listados, pero sobre el
+    orden de la cola: la página siguiente empieza después de ese trabajo.
+    Los trabajos sin fecha (ilegible al migrar) van al final en ambas bases.
+    """
+    if estado not in ESTADOS_TRABAJO: raise HTTPException(400, f"Estado inválido: {estado}")
+    T = models.TrabajoFotocopia
+    q = db.query(T).options(selectinload(T.pagos)).filter(T.estado == estado)
+    if after_id is None:
+        response.headers["X-Total-Count"] = str(q.order_by(None).count())
+    else:
+        ultimo = db.get(T, after_id)
+        if not ultimo: raise HTTPException(404)
+        # Spelled out: a row-value comparison with a NULL fecha is NULL
+        if ultimo.fecha is None:
+            q = q.filter(T.fecha.is_(None), T.id > ultimo.id)
+        else:
+            q = q.filter(or_(T.fecha > ultimo.fecha, and_(T.fecha == ultimo.fecha, T.id > ultimo.id), T.fecha.is_(None)))
+    items = q.order_by(T.fecha.nulls_last(), T.id).limit(limit).all()
+    if len(items) == limit:
+        response.headers["X-Next-After-Id"] = str(items[-1].id)
+    return respuestas.lista(schemas.TrabajoFotocopia, items, response)
+
+@api_router.get("/trabajos-fotocopia/resumen", response_model=List[schemas.ResumenCola])
+def resumen_trabajos(db: Session = Depends(get_db)):
+    """Por estado: cantidad de trabajos, copias, importe, pagado y adeudado."""
+    T, P = models.TrabajoFotocopia, models.PagoFotocopia
+    pagado = select(P.trabajo_id, func.sum(P.monto).label("monto")).group_by(P.trabajo_id).subquery()
+    cobrado = func.coalesce(pagado.c.monto, 0)
+    filas = db.execute(
+        select(
+            T.estado,
+            func.count(T.id).label("trabajos"),
+            func.coalesce(func.sum(T.cantidad), 0).label("copias"),
+            func.coalesce(func.sum(T.precio), 0).label("importe"),
+            func.coalesce(func.sum(cobrado), 0).label("pagado"),
+            func.coalesce(func.sum(func.coalesce(T.precio, 0) - cobrado), 0).label("adeudado"),
+        )
+        .outerjoin(pagado, pagado.c.trabajo_id == T.id)
+        .group_by(T.estado)
+    ).all()
+    por_estado = {f.estado: f._asdict() for f in filas}
+    vacio = {"trabajos": 0, "copias": 0, "importe": 0, "pagado": 0, "adeudado": 0}
+    return [por_estado.get(e, {**vacio, "estado": e}) for e in ESTADOS_TRABAJO] + [
+        f for e, f in por_estado.items() if e not in ESTADOS_TRABAJO
+    ]
+
+@api_router.put("/trabajos-fotocopia/estado")
+def update_trabajos_estado(cambios: List[schemas.CambioEstado], db: Session = Depends(get_db)):
+    """Cambia el estado de varios trabajos en una sola transacción (un UPDATE por estado)."""
+    T = models.TrabajoFotocopia
+    nuevos = {c.id: c.estado for c in cambios}
+    invalidos = set(nuevos.values()) - set(ESTADOS_TRABAJO)
+    if invalidos: raise HTTPException(400, f"Estados inválidos: {sorted(invalidos)}")
+    faltantes = set(nuevos) - set(db.scalars(select(T.id).where(T.id.in_(nuevos))))
+    if faltantes: raise HTTPException(404, f"Trabajos inexistentes: {sorted(faltantes)}")
+    for estado in set(nuevos.values()):
+        ids = [i for i, e in nuevos.items() if e == estado]
+        db.execute(update(T).where(T.id.in_(ids)).values(estado=estado), execution_options={"synchronize_session": False})
+        for i in ids:
+            eventos.publicar(db, "trabajo.estado", id=i, estado=estado)
+    db.commit()
+    return {"ok": True, "actualizados": len(nuevos)}
 
 @api_router.post("/trabajos-fotocopia/", response_model=schemas.TrabajoFotocopia)
 def create_trabajo(t: schemas.TrabajoFotocopiaCreate, db: Session = Depends(get_db)):
     obj = models.TrabajoFotocopia(**t.model_dump())
-    db.add(obj); db.commit(); db.refresh(obj)
+    db.add(obj); db.flush()
+    eventos.publicar(db, "trabajo.creado", id=obj.id)
+    db.commit(); db.refresh(obj)
     return obj
 
 @api_router.put("/trabajos-fotocopia/{id}/estado")
@@ -403,6 +695,7 @@ def update_trabajo_estado(id: int, estado: str, db: Session = Depends(get_db)):
     obj = db.query(models.TrabajoFotocopia).get(id)
     if not obj: raise HTTPException(404)
     obj.estado = estado
+    eventos.publicar(db, "trabajo.estado", id=id, estado=estado)
     db.commit()
     return {"ok": True}
 
@@ -410,6 +703,7 @@ def update_trabajo_estado(id: int, estado: str, db: Session = Depends(get_db)):
 def delete_trabajo(id: int, db: Session = Depends(get_db)):
     obj = db.query(models.TrabajoFotocopia).get(id)
     if not obj: raise HTTPException(404)
+    eventos.publicar(db, "trabajo.eliminado", id=id)
     db.delete(obj); db.commit()
     return {"ok": True}
 
@@ -418,14 +712,17 @@ def add_pago_fotocopia(trabajo_id: int, pago: schemas.PagoFotocopiaCreate, db: S
     t = db.query(models.TrabajoFotocopia).get(trabajo_id)
     if not t: raise HTTPException(404)
     obj = models.PagoFotocopia(**pago.model_dump(), trabajo_id=trabajo_id)
+    eventos.publicar(db, "pago_fotocopia.creado", trabajo_id=trabajo_id, monto=pago.monto)
     db.add(obj); db.commit(); db.refresh(obj)
     return obj
 
 # ==================== LIBRETA (Fiados) ====================
 
 @api_router.get("/clientes/", response_model=List[schemas.Cliente])
-def list_clientes(db: Session = Depends(get_db)):
-    return db.query(models.Cliente).all()
+def list_clientes(response: Response, after_id: Optional[int] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db: Session = Depends(get_db)):
+    q = db.query(models.Cliente).options(selectinload(models.Cliente.transacciones))
+    items = paginate(q, models.Cliente, response, after_id, limit)
+    return respuestas.lista(schemas.Cliente, items, response)
 
 @api_router.post("/clientes/", response_model=schemas.Cliente)
 def create_cliente(c: schemas.ClienteCreate, db: Session = Depends(get_db)):
@@ -473,6 +770,7 @@ def marcar_pedido(data: dict, db: Session = Depends(get_db)):
     count = 0
     for lp in libros_faltantes:
         lp.estado = "pedido"
+        eventos.publicar(db, "libro_pedido.estado", id=lp.id, pedido_id=lp.pedido_id, estado=lp.estado)
         count += 1
     db.commit()
     return {"ok": True, "count": count}
@@ -487,6 +785,7 @@ def marcar_local(data: dict, db: Session = Depends(get_db)):
     count = 0
     for lp in libros_pedidos:
         lp.estado = "en_local"
+        eventos.publicar(db, "libro_pedido.estado", id=lp.id, pedido_id=lp.pedido_id, estado=lp.estado)
         count += 1
     db.commit()
     return {"ok": True, "count": count}
@@ -507,34 +806,76 @@ def ingresar_stock(data: schemas.StockLibroCreate, db: Session = Depends(get_db)
         if cantidad_restante <= 0:
             break
         lp.estado = "en_local"
+        eventos.publicar(db, "libro_pedido.estado", id=lp.id, pedido_id=lp.pedido_id, estado=lp.estado)
         cantidad_restante -= 1
         asignados += 1
 
     # Save remaining to stock
     if cantidad_restante > 0:
-        existing = db.query(models.StockLibro).filter(
-            models.StockLibro.titulo == data.titulo,
-            models.StockLibro.tipo == data.tipo
-        ).first()
-        if existing:
-            existing.cantidad += cantidad_restante
-        else:
-            db.add(models.StockLibro(titulo=data.titulo, tipo=data.tipo, cantidad=cantidad_restante))
+        sumar_stock(db, data.titulo, data.tipo, cantidad_restante, data.isbn)
 
     db.commit()
     return {"ok": True, "asignados_a_pedidos": asignados, "al_stock": cantidad_restante}
 
-
+# ==================== BUSCADOR DE PERSONAS ====================
+
+@api_router.get("/personas/buscar", response_model=List[schemas.PersonaEncontrada])
+def buscar_personas(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db)):
+    """Busca por nombre (tolera errores de tipeo) o teléfono en pedidos, fotocopias y libreta."""
+    return personas.buscar(db, q, limit)
+
+# ==================== REPORTES ====================
+
+@api_router.get("/reportes/diario", response_model=List[schemas.ResumenDia])
+def reporte_diario(desde: Optional[date] = None, hasta: Optional[date] = None, modulo: Optional[str] = None, db: Session = Depends(get_db)):
+    """Totales por día y concepto (por defecto, los últimos 7 días)."""
+    return reportes.diario(db, *reportes.rango(desde, hasta), modulo)
+
+@api_router.get("/reportes/totales", response_model=schemas.ResumenTotales)
+def reporte_totales(desde: Optional[date] = None, hasta: Optional[date] = None, db: Session = Depends(get_db)):
+    """Totales del rango por módulo y concepto, y lo cobrado entre todos."""
+    return reportes.totales(db, *reportes.rango(desde, hasta))
+
+# ==================== SINCRONIZACIÓN ====================
+
+@api_router.get("/sync")
+def sincronizar(since: Optional[str] = None, limit: int = Query(sync.LIMITE, ge=1, le=sync.LIMITE), db: Session = Depends(get_db)):
+    """Cambios y bajas desde el cursor `since`; sin cursor devuelve todo.
+
+    Mientras `mas` sea true hay que volver a pedir con el cursor devuelto.
+    """
+    return sync.cambios(db, since, limit)
+
+# ==================== EVENTOS (cambios en vivo) ====================
+
+@app.get("/api/eventos")
+async def stream_eventos(token: Optional[str] = None, desde: Optional[str] = None,
+                         authorization: Optional[str] = Header(None), last_event_id: Optional[str] = Header(None)):
+    """Server-Sent Events con los cambios de pedidos, stock y trabajos.
+
+    EventSource no puede mandar headers, así que el token también se acepta
+    como ?token=. Al reconectar el navegador manda Last-Event-ID; ?desde=
+    sirve para retomar en la primera conexión.
+    """
+    if token is None and authorization and authorization.startswith("Bearer "):
+        token = authorization[len("Bearer "):]
+    try:
+        decode_token(token or "")
+    except JWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="No se pudo validar las credenciales")
+    return StreamingResponse(
+        eventos.bus.stream(last_event_id or desde),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+if DB_ASYNC:
+    # Registered first so the async list handlers take over those routes
+    from . import async_api
+    app.include_router(async_api.router, prefix="/api")
 app.include_router(api_router, prefix="/api")
 
 # Catch-all route for SPA (must be last)
 @app.get("/{path:path}")
-def serve_spa(path: str):
-    # Try to serve static file first
-    file_path = os.path.join(FRONTEND_DIR, path)
-    if os.path.isdir(FRONTEND_DIR) and os.path.isfile(file_path):
-        return FileResponse(file_path)
-    # Otherwise serve index.html for SPA routing
-    if os.path.isdir(FRONTEND_DIR):
-        return FileResponse(os.path.join(FRONTEND_DIR, "index.html"))
-    return {"message": "Not found"}
+async def serve_spa(path: str, request: Request):
+    return frontend.servir(path, request)
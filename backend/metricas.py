@@ -0,0 +1,226 @@
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+# Per-request instrumentation. MetricasMiddleware opens a Medicion in a
+# context variable; SQLAlchemy cursor events add every statement to it (the
+# variable is copied into the threadpool, so sync endpoints count too) and
+# RutaMedida records the route template and when the endpoint returned, so
+# the time until the response starts is what FastAPI spent validating and
+# serializing. Totals go out as a Server-Timing header and are accumulated
+# into per-route histograms served at /metrics in Prometheus text format.
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 500))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+MAX_SENTENCIAS = 100  # statements kept per request for the slow log
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Medicion:
+    inicio: float = field(default_factory=time.perf_counter)
+    ruta: Optional[str] = None
+    sql_count: int = 0
+    sql_s: float = 0.0
+    serializacion_s: float = 0.0
+    fin_endpoint: Optional[float] = None
+    sentencias: list = field(default_factory=list)
+
+_actual: ContextVar[Optional[Medicion]] = ContextVar("medicion", default=None)
+
+# ---------- SQL ----------
+
+def instrumentar(engine):
+    """Cuenta y mide las sentencias que ejecuta el engine (sync)."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        context._metricas_t0 = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        m = _actual.get()
+        if m is None:
+            return
+        dur = time.perf_counter() - context._metricas_t0
+        m.sql_count += 1
+        m.sql_s += dur
+        if len(m.sentencias) < MAX_SENTENCIAS:
+            m.sentencias.append((dur, statement))
+
+# ---------- Rutas ----------
+
+class RutaMedida(APIRoute):
+    """APIRoute que anota en la medición la ruta y el fin del endpoint."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _marcar_fin(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        ruta = self.path_format
+
+        async def medido(request):
+            m = _actual.get()
+            if m is not None:
+                # The template is relative to the router; whatever precedes
+                # the concrete match in the URL is the include prefix.
+                path = request.scope["path"]
+                local = ruta.format(**request.path_params)
+                m.ruta = path[:len(path) - len(local)] + ruta if path.endswith(local) else ruta
+            return await handler(request)
+        return medido
+
+def _marcar_fin(endpoint):
+    # functools.wraps keeps __wrapped__, so FastAPI still reads the
+    # endpoint's own signature for parameters and dependencies.
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def envuelto(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _fin_endpoint()
+    else:
+        @functools.wraps(endpoint)
+        def envuelto(*args, **kwargs):
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _fin_endpoint()
+    return envuelto
+
+def _fin_endpoint():
+    m = _actual.get()
+    if m is not None:
+        m.fin_endpoint = time.perf_counter()
+
+def sumar_serializacion(segundos: float):
+    """Para serializaciones hechas dentro del endpoint (ver respuestas.py)."""
+    m = _actual.get()
+    if m is not None:
+        m.serializacion_s += segundos
+
+# ---------- Middleware ----------
+
+class MetricasMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        m = Medicion()
+        token = _actual.set(m)
+        estado = 500
+        stream = False
+
+        async def send_medido(message):
+            nonlocal estado, stream
+            if message["type"] == "http.response.start":
+                estado = message["status"]
+                stream = any(k.lower() == b"content-type" and v.startswith(b"text/event-stream")
+                             for k, v in message.get("headers", []))
+                ahora = time.perf_counter()
+                if m.fin_endpoint is not None:
+                    m.serializacion_s += ahora - m.fin_endpoint
+                header = (
+                    f'app;dur={(ahora - m.inicio) * 1000:.1f}, '
+                    f'db;dur={m.sql_s * 1000:.1f};desc="{m.sql_count} queries", '
+                    f'serialize;dur={m.serializacion_s * 1000:.1f}'
+                )
+                message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_medido)
+        finally:
+            _actual.reset(token)
+            total = time.perf_counter() - m.inicio
+            ruta = m.ruta or "(sin ruta)"
+            registro.observar(scope["method"], ruta, estado, total, m)
+            if total * 1000 >= SLOW_REQUEST_MS and not stream:  # SSE stays open on purpose
+                _log_lento(scope, ruta, estado, total, m)
+
+def _log_lento(scope, ruta, estado, total, m):
+    lineas = [
+        f"Request lento: {scope['method']} {scope['path']} ({ruta}) -> {estado} en {total * 1000:.0f} ms, "
+        f"{m.sql_count} sentencias SQL en {m.sql_s * 1000:.0f} ms, serialización {m.serializacion_s * 1000:.0f} ms"
+    ]
+    lineas += [f"  {dur * 1000:8.1f} ms  {' '.join(sql.split())}" for dur, sql in m.sentencias]
+    if m.sql_count > len(m.sentencias):
+        lineas.append(f"  ... y {m.sql_count - len(m.sentencias)} más")
+    logger.warning("\n".join(lineas))
+
+# ---------- Histogramas ----------
+
+class Histograma:
+    def __init__(self, nombre, ayuda, buckets):
+        self.nombre, self.ayuda, self.buckets = nombre, ayuda, buckets
+        self.series = {}  # labels -> [bucket counts..., sum, count]
+
+    def observar(self, labels, valor):
+        serie = self.series.get(labels)
+        if serie is None:
+            serie = self.series[labels] = [0] * (len(self.buckets) + 2)
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                serie[i] += 1
+        serie[-2] += valor
+        serie[-1] += 1
+
+    def exponer(self, nombres_labels):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        for labels, serie in sorted(self.series.items()):
+            base = ",".join(f'{k}="{_escapar(v)}"' for k, v in zip(nombres_labels, labels))
+            for limite, n in zip(self.buckets, serie):
+                lineas.append(f'{self.nombre}_bucket{{{base},le="{limite}"}} {n}')
+            lineas.append(f'{self.nombre}_bucket{{{base},le="+Inf"}} {serie[-1]}')
+            lineas.append(f"{self.nombre}_sum{{{base}}} {serie[-2]}")
+            lineas.append(f"{self.nombre}_count{{{base}}} {serie[-1]}")
+        return lineas
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Registro:
+    LABELS = ("method", "route")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.duracion = Histograma("http_request_duration_seconds", "Tiempo total del request.", DURATION_BUCKETS)
+        self.sql = Histograma("http_request_sql_seconds", "Tiempo en SQL por request.", DURATION_BUCKETS)
+        self.sql_count = Histograma("http_request_sql_statements", "Sentencias SQL por request.", QUERY_BUCKETS)
+        self.serializacion = Histograma("http_request_serialization_seconds", "Tiempo de serialización por request.", DURATION_BUCKETS)
+        self.requests = {}  # (method, route, status) -> count
+
+    def observar(self, method, ruta, estado, total, m: Medicion):
+        labels = (method, ruta)
+        with self.lock:
+            self.duracion.observar(labels, total)
+            self.sql.observar(labels, m.sql_s)
+            self.sql_count.observar(labels, m.sql_count)
+            self.serializacion.observar(labels, m.serializacion_s)
+            clave = (method, ruta, estado)
+            self.requests[clave] = self.requests.get(clave, 0) + 1
+
+    def exponer(self) -> str:
+        with self.lock:
+            lineas = ["# HELP http_requests_total Requests atendidos.", "# TYPE http_requests_total counter"]
+            for (method, ruta, estado), n in sorted(self.requests.items()):
+                lineas.append(f'http_requests_total{{method="{method}",route="{_escapar(ruta)}",status="{estado}"}} {n}')
+            for h in (self.duracion, self.sql, self.sql_count, self.serializacion):
+                lineas += h.exponer(self.LABELS)
+        return "\n".join(lineas) + "\n"
+
+registro = Registro()
@@ -0,0 +1,143 @@
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import Date, MetaData, inspect, text
+
+from . import models, precios
+
+# create_all() only creates missing tables. This brings existing databases
+# up to date with the models: columns added after a table was created and
+# indexes declared on them. New columns must be nullable or have a server
+# default so the ALTER works on tables that already have rows.
+
+def add_missing_columns(conn, metadata):
+    insp = inspect(conn)
+    for table in metadata.sorted_tables:
+        if not insp.has_table(table.name, schema=table.schema):
+            continue
+        existentes = {c["name"] for c in insp.get_columns(table.name, schema=table.schema)}
+        for col in table.columns:
+            if col.name in existentes:
+                continue
+            tipo = col.type.compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE {table.fullname} ADD COLUMN {col.name} {tipo}'))
+
+def backfill_updated_at(conn, metadata):
+    # Rows that predate the updated_at column get the migration time, so a
+    # first full sync covers them and later deltas compare against a value.
+    ahora = datetime.now(timezone.utc).replace(tzinfo=None)
+    for table in metadata.sorted_tables:
+        if "updated_at" in table.c:
+            conn.execute(table.update().where(table.c.updated_at.is_(None)).values(updated_at=ahora))
+
+def parse_fecha(valor) -> Optional[date]:
+    """Fecha de los viejos campos de texto: ISO o d/m/aaaa (None si no se entiende)."""
+    texto = str(valor).strip()
+    try:
+        if "/" in texto:
+            d, m, a = texto.split("/")
+            return date(int(a), int(m), int(d))
+        return date.fromisoformat(texto[:10])
+    except ValueError:
+        return None
+
+def convert_date_columns(conn, metadata):
+    # The fecha fields started as free text. Values are rewritten as ISO
+    # dates (NULL when unreadable) and then the column type changes: an
+    # ALTER on PostgreSQL, a table rebuild on SQLite, which can't alter
+    # columns. A column already reflected as DATE is left alone.
+    insp = inspect(conn)
+    for table in metadata.sorted_tables:
+        if not insp.has_table(table.name, schema=table.schema):
+            continue
+        actuales = {c["name"]: c["type"] for c in insp.get_columns(table.name, schema=table.schema)}
+        pendientes = [
+            col.name for col in table.columns
+            if isinstance(col.type, Date) and col.name in actuales and not isinstance(actuales[col.name], Date)
+        ]
+        if not pendientes:
+            continue
+        for columna in pendientes:
+            normalize_dates(conn, table.fullname, columna)
+        if conn.dialect.name == "postgresql":
+            for columna in pendientes:
+                conn.execute(text(f"ALTER TABLE {table.fullname} ALTER COLUMN {columna} TYPE DATE USING {columna}::date"))
+        else:
+            rebuild_sqlite_table(conn, table)
+
+def normalize_dates(conn, tabla: str, columna: str):
+    valores = conn.execute(text(f"SELECT DISTINCT {columna} FROM {tabla} WHERE {columna} IS NOT NULL")).scalars()
+    cambios = []
+    for valor in valores:
+        fecha = parse_fecha(valor)
+        nuevo = fecha.isoformat() if fecha else None
+        if nuevo != valor:
+            cambios.append({"viejo": valor, "nuevo": nuevo})
+    if not cambios:
+        return
+    # One pass over the table through a lookup table, not one UPDATE per value
+    conn.execute(text("CREATE TEMPORARY TABLE _fechas (viejo VARCHAR PRIMARY KEY, nuevo VARCHAR)"))
+    conn.execute(text("INSERT INTO _fechas (viejo, nuevo) VALUES (:viejo, :nuevo)"), cambios)
+    conn.execute(text(
+        f"UPDATE {tabla} SET {columna} = (SELECT nuevo FROM _fechas WHERE viejo = {columna}) "
+        f"WHERE {columna} IN (SELECT viejo FROM _fechas)"
+    ))
+    conn.execute(text("DROP TABLE _fechas"))
+
+def rebuild_sqlite_table(conn, table):
+    # The documented SQLite procedure: create the new table under another
+    # name, copy, drop the old one and rename. Indexes come back in
+    # create_missing_indexes. Needs foreign_keys off (SQLite's default).
+    copia = MetaData()
+    for t in table.metadata.sorted_tables:
+        t.to_metadata(copia)
+    nueva = table.to_metadata(copia, name=f"{table.name}__nueva")
+    nueva.indexes.clear()
+    nueva.create(conn)
+    columnas = ", ".join(c.name for c in table.columns)
+    conn.execute(text(f"INSERT INTO {nueva.fullname} ({columnas}) SELECT {columnas} FROM {table.fullname}"))
+    conn.execute(text(f"DROP TABLE {table.fullname}"))
+    # RENAME TO takes a bare name: the table stays in its schema
+    conn.execute(text(f"ALTER TABLE {nueva.fullname} RENAME TO {table.name}"))
+
+def create_missing_indexes(conn, metadata):
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+def merge_duplicate_stock(conn):
+    # ux_stock_libros_titulo_tipo can't be built while a title+type pair is
+    # repeated: keep the oldest row with the summed quantity.
+    insp = inspect(conn)
+    if not insp.has_table("stock_libros"):
+        return
+    if any(ix["name"] == "ux_stock_libros_titulo_tipo" for ix in insp.get_indexes("stock_libros")):
+        return
+    duplicados = conn.execute(text(
+        "SELECT titulo, tipo, min(id), sum(cantidad) FROM stock_libros "
+        "GROUP BY titulo, tipo HAVING count(*) > 1"
+    )).all()
+    for titulo, tipo, id_, cantidad in duplicados:
+        params = {"titulo": titulo, "tipo": tipo, "id": id_, "cantidad": cantidad}
+        conn.execute(text("UPDATE stock_libros SET cantidad = :cantidad WHERE id = :id"), params)
+        conn.execute(text(
+            "DELETE FROM stock_libros WHERE titulo = :titulo AND tipo = :tipo AND id != :id"
+        ), params)
+
+def fix_rounded_prices(conn, metadata):
+    # Prices stored before calc_price rounded to cents could be $1 over
+    # (ceil(110.00000000000001) is 111). Only rows that differ from the
+    # current formula are written, so after the first run this is a read.
+    if models.Producto.__table__.name not in metadata.tables:
+        return
+    precios.reprice(conn, models.Producto.precio_publico.is_distinct_from(precios.precio_sql()))
+
+def upgrade(engine, metadata):
+    """Aplica los cambios de esquema pendientes sobre una base existente."""
+    with engine.begin() as conn:
+        add_missing_columns(conn, metadata)
+        convert_date_columns(conn, metadata)
+        backfill_updated_at(conn, metadata)
+        merge_duplicate_stock(conn)
+        fix_rounded_prices(conn, metadata)
+        create_missing_indexes(conn, metadata)
@@ -1,7 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, Boolean
+from sqlalchemy import Column, DDL, Integer, String, Float, ForeignKey, Date, DateTime, Text, Boolean, Index, event
 from sqlalchemy.orm import relationship
-from .database import Base
-from datetime import datetime
+from .database import ARCHIVO_SCHEMA, Base
+from datetime import datetime, timezone
+
+def ahora():
+    """Hora UTC sin zona, como se guardan las marcas de sincronización."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class Sincronizable:
+    """Marca de última modificación que usa /api/sync (ver sync.py)."""
+    updated_at = Column(DateTime, default=ahora, onupdate=ahora, index=True)
 
 class Usuario(Base):
     __tablename__ = "usuarios"
@@ -24,6 +32,7 @@ class Producto(Base):
     isbn = Column(String, index=True, nullable=True)
     descripcion = Column(String, index=True)
     costo_base = Column(Float)
+    precio_publico = Column(Float, index=True)  # kept in sync by precios.reprice()
     categoria_id = Column(Integer, ForeignKey("categorias.id"))
     categoria = relationship("Categoria", back_populates="productos")
 
@@ -44,18 +53,21 @@ class LibroCatalogo(Base):
     precio = Column(Float, default=0)
     grado = relationship("Grado", back_populates="libros")
 
-class Pedido(Base):
+class Pedido(Sincronizable, Base):
     __tablename__ = "pedidos"
     id = Column(Integer, primary_key=True, index=True)
     cliente = Column(String, index=True)
     telefono = Column(String, nullable=True)
-    fecha = Column(String)
-    fecha_tentativa = Column(String, nullable=True)
+    fecha = Column(Date, index=True)
+    fecha_tentativa = Column(Date, nullable=True)
     archivado = Column(Boolean, default=False)
     libros = relationship("LibroPedido", back_populates="pedido", cascade="all, delete-orphan")
     pagos = relationship("PagoPedido", back_populates="pedido", cascade="all, delete-orphan")
 
-class LibroPedido(Base):
+    # Open orders past their promised date: an index range scan (see /pedidos/vencidos/)
+    __table_args__ = (Index("ix_pedidos_archivado_fecha_tentativa", "archivado", "fecha_tentativa"),)
+
+class LibroPedido(Sincronizable, Base):
     __tablename__ = "libros_pedido"
     id = Column(Integer, primary_key=True, index=True)
     pedido_id = Column(Integer, ForeignKey("pedidos.id"))
@@ -65,16 +77,16 @@ class LibroPedido(Base):
     estado = Column(String, default="faltante")  # faltante, pedido, en_local, entregado
     pedido = relationship("Pedido", back_populates="libros")
 
-class PagoPedido(Base):
+class PagoPedido(Sincronizable, Base):
     __tablename__ = "pagos_pedido"
     id = Column(Integer, primary_key=True, index=True)
     pedido_id = Column(Integer, ForeignKey("pedidos.id"))
     monto = Column(Float)
-    fecha = Column(String)
+    fecha = Column(Date, index=True)
     nota = Column(String, nullable=True)
     pedido = relationship("Pedido", back_populates="pagos")
 
-class StockLibro(Base):
+class StockLibro(Sincronizable, Base):
     __tablename__ = "stock_libros"
     id = Column(Integer, primary_key=True, index=True)
     titulo = Column(String, index=True)
@@ -82,6 +94,48 @@ class StockLibro(Base):
     tipo = Column(String, default="nuevo")  # nuevo, usado
     cantidad = Column(Integer, default=0)
 
+    __table_args__ = (Index("ux_stock_libros_titulo_tipo", "titulo", "tipo", unique=True),)
+
+# ===== ENCARGOS — Archivo (pedidos viejos; ver archivo.py) =====
+
+# Same columns as the hot tables, so rows move with INSERT ... SELECT
+event.listen(Base.metadata, "before_create", DDL(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVO_SCHEMA}").execute_if(dialect="postgresql"))
+
+class PedidoArchivo(Base):
+    __tablename__ = "pedidos"
+    __table_args__ = {"schema": ARCHIVO_SCHEMA}
+    id = Column(Integer, primary_key=True)
+    cliente = Column(String, index=True)
+    telefono = Column(String, nullable=True)
+    fecha = Column(Date, index=True)
+    fecha_tentativa = Column(Date, nullable=True)
+    archivado = Column(Boolean, default=True)
+    updated_at = Column(DateTime)
+    movido_en = Column(DateTime, default=ahora, index=True)
+    libros = relationship("LibroPedidoArchivo", cascade="all, delete-orphan")
+    pagos = relationship("PagoPedidoArchivo", cascade="all, delete-orphan")
+
+class LibroPedidoArchivo(Base):
+    __tablename__ = "libros_pedido"
+    __table_args__ = {"schema": ARCHIVO_SCHEMA}
+    id = Column(Integer, primary_key=True)
+    pedido_id = Column(Integer, ForeignKey(f"{ARCHIVO_SCHEMA}.pedidos.id"), index=True)
+    titulo = Column(String)
+    isbn = Column(String, nullable=True)
+    precio = Column(Float, default=0)
+    estado = Column(String)
+    updated_at = Column(DateTime)
+
+class PagoPedidoArchivo(Base):
+    __tablename__ = "pagos_pedido"
+    __table_args__ = {"schema": ARCHIVO_SCHEMA}
+    id = Column(Integer, primary_key=True)
+    pedido_id = Column(Integer, ForeignKey(f"{ARCHIVO_SCHEMA}.pedidos.id"), index=True)
+    monto = Column(Float)
+    fecha = Column(Date, index=True)
+    nota = Column(String, nullable=True)
+    updated_at = Column(DateTime)
+
 # ===== FOTOCOPIAS =====
 
 class AnioFotocopia(Base):
@@ -99,16 +153,17 @@ class MaterialCatalogo(Base):
     precio = Column(Float, default=0)
     anio = relationship("AnioFotocopia", back_populates="materiales")
 
-class TrabajoFotocopia(Base):
+class TrabajoFotocopia(Sincronizable, Base):
     __tablename__ = "trabajos_fotocopia"
+    __table_args__ = (Index("ix_trabajos_fotocopia_estado_fecha", "estado", "fecha"),)  # the print queue
     id = Column(Integer, primary_key=True, index=True)
-    solicitante = Column(String)
+    solicitante = Column(String, index=True)
     material = Column(String)
     cantidad = Column(Integer, default=1)
     precio = Column(Float, default=0)
     telefono = Column(String, nullable=True)
     estado = Column(String, default="pendiente")  # pendiente, listo, entregado
-    fecha = Column(String)
+    fecha = Column(Date, index=True)
     pagos = relationship("PagoFotocopia", back_populates="trabajo", cascade="all, delete-orphan")
 
 class PagoFotocopia(Base):
@@ -116,13 +171,13 @@ class PagoFotocopia(Base):
     id = Column(Integer, primary_key=True, index=True)
     trabajo_id = Column(Integer, ForeignKey("trabajos_fotocopia.id"))
     monto = Column(Float)
-    fecha = Column(String)
+    fecha = Column(Date, index=True)
     nota = Column(String, nullable=True)
     trabajo = relationship("TrabajoFotocopia", back_populates="pagos")
 
 # ===== LIBRETA (Fiados) =====
 
-class Cliente(Base):
+class Cliente(Sincronizable, Base):
     __tablename__ = "clientes"
     id = Column(Integer, primary_key=True, index=True)
     nombre = Column(String, index=True)
@@ -130,12 +185,37 @@ class Cliente(Base):
     saldo_total = Column(Float, default=0.0)
     transacciones = relationship("TransaccionFiado", back_populates="cliente", cascade="all, delete-orphan")
 
-class TransaccionFiado(Base):
+class TransaccionFiado(Sincronizable, Base):
     __tablename__ = "transacciones_fiados"
     id = Column(Integer, primary_key=True, index=True)
     cliente_id = Column(Integer, ForeignKey("clientes.id"))
-    fecha = Column(String)
+    fecha = Column(Date, index=True)
     detalle = Column(String)
     tipo_operacion = Column(String)  # cargo, abono
     monto = Column(Float)
     cliente = relationship("Cliente", back_populates="transacciones")
+
+# ===== SISTEMA =====
+
+class VersionCatalogo(Base):
+    """Contador de cambios por catálogo; ver catalogo.py."""
+    __tablename__ = "versiones_catalogo"
+    nombre = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class Baja(Base):
+    """Fila borrada de una tabla sincronizable; ver sync.py."""
+    __tablename__ = "bajas"
+    id = Column(Integer, primary_key=True)
+    tabla = Column(String, nullable=False)
+    fila_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, nullable=False, default=ahora, index=True)
+
+class ResumenDiario(Base):
+    """Totales por día, módulo y concepto de pagos y fiados; ver reportes.py."""
+    __tablename__ = "resumen_diario"
+    fecha = Column(Date, primary_key=True)
+    modulo = Column(String, primary_key=True)  # encargos, fotocopias, fiados
+    concepto = Column(String, primary_key=True)  # sena, pago, cargo, abono
+    monto = Column(Float, nullable=False, default=0)
+    cantidad = Column(Integer, nullable=False, default=0)
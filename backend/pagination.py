@@ -0,0 +1,44 @@
+from datetime import date
+from typing import Optional
+from fastapi import Response
+from sqlalchemy import func, select
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def paginate(query, model, response: Response, after_id: Optional[int], limit: int):
+    """Paginación keyset por id.
+
+    El total (X-Total-Count) sólo se cuenta en la primera página, así las
+    siguientes son un único rango sobre la clave primaria. Si la página
+    vino completa, el cursor siguiente va en X-Next-After-Id.
+    """
+    if after_id is None:
+        response.headers["X-Total-Count"] = str(query.order_by(None).count())
+    else:
+        query = query.filter(model.id > after_id)
+    items = query.order_by(model.id).limit(limit).all()
+    if len(items) == limit:
+        response.headers["X-Next-After-Id"] = str(items[-1].id)
+    return items
+
+async def paginate_async(db, stmt, model, response: Response, after_id: Optional[int], limit: int):
+    """Igual que paginate() para un select() sobre una AsyncSession."""
+    if after_id is None:
+        total = await db.scalar(select(func.count()).select_from(stmt.order_by(None).subquery()))
+        response.headers["X-Total-Count"] = str(total)
+    else:
+        stmt = stmt.where(model.id > after_id)
+    items = (await db.scalars(stmt.order_by(model.id).limit(limit))).all()
+    if len(items) == limit:
+        response.headers["X-Next-After-Id"] = str(items[-1].id)
+    return items
+
+def entre_fechas(columna, desde: Optional[date], hasta: Optional[date]) -> list:
+    """Filtros de ?desde=&hasta= (inclusive) sobre una columna de fecha."""
+    criterios = []
+    if desde is not None:
+        criterios.append(columna >= desde)
+    if hasta is not None:
+        criterios.append(columna <= hasta)
+    return criterios
@@ -0,0 +1,281 @@
+import logging
+import re
+import unicodedata
+from collections import defaultdict
+
+from sqlalchemy import select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, selectinload
+
+from . import models
+
+# One customer search over the three places a name is typed: pedidos
+# (cliente), trabajos de fotocopia (solicitante) and the libreta (clientes).
+# Clerks misspell names, so matching is by trigram similarity rather than
+# by prefix, and phones match on their digits alone.
+#
+# On SQLite an FTS5 trigram index holds every name and phone, lowercased,
+# without accents and with the phone reduced to digits. Triggers keep it
+# in sync, as with productos_fts. The rowid is id * 3 + origin, so a row
+# is found without scanning. On PostgreSQL the same normalized expressions
+# get pg_trgm GIN indexes on the tables themselves.
+#
+# The index only supplies candidates (up to CANDIDATOS); they are scored in
+# Python the same way on both databases and grouped by normalized name.
+# Trigrams miss swapped letters in short names ("lius" shares one of five
+# with "luis"), so candidates are also fetched for each adjacent swap of the
+# query, which then scores PENALIZACION_CAMBIO below the exact spelling.
+FTS_TABLE = "personas_fts"
+CANDIDATOS = 200
+SIMILITUD_MINIMA = 0.3
+PENALIZACION_CAMBIO = 0.8
+MAX_VARIANTES = 20
+
+ORIGENES = [  # (origin, table, name column); the position is the rowid offset
+    ("pedido", "pedidos", "cliente"),
+    ("trabajo", "trabajos_fotocopia", "solicitante"),
+    ("cliente", "clientes", "nombre"),
+]
+
+logger = logging.getLogger(__name__)
+
+# ---------- Normalización ----------
+
+# Spanish accents only: SQLite's parser overflows past ~25 nested replace()
+_CON_ACENTO = "áéíóúüñÁÉÍÓÚÜÑ"
+_SIN_ACENTO = "aeiouunAEIOUUN"
+_SEPARADORES_TELEFONO = " -()+./"
+
+def normalizar(nombre) -> str:
+    sin_acentos = unicodedata.normalize("NFD", nombre or "").encode("ascii", "ignore").decode()
+    return " ".join(sin_acentos.lower().split())
+
+def digitos(telefono) -> str:
+    return re.sub(r"\D", "", telefono or "")
+
+def _nombre_sql(expr: str) -> str:
+    # SQLite's lower() only knows ASCII, so accents go first, both cases
+    expr = f"coalesce({expr}, '')"
+    for con, sin in zip(_CON_ACENTO, _SIN_ACENTO):
+        expr = f"replace({expr}, '{con}', '{sin}')"
+    # Padded like trigramas() ("  ana  gomez "), so the word-start and
+    # word-end trigrams are substrings the FTS index can match
+    return f"'  ' || replace(lower({expr}), ' ', '  ') || ' '"
+
+def _telefono_sql(expr: str) -> str:
+    expr = f"coalesce({expr}, '')"
+    for sep in _SEPARADORES_TELEFONO:
+        expr = f"replace({expr}, '{sep}', '')"
+    return expr
+
+_PG_NOMBRE = "translate(lower(coalesce({0}, '')), 'áàâäéèêëíìîïóòôöúùûüñç', 'aaaaeeeeiiiioooouuuunc')"
+_PG_TELEFONO = "regexp_replace(coalesce(telefono, ''), '[^0-9]', '', 'g')"
+
+def trigramas(texto: str) -> set:
+    """Trigramas por palabra, con el relleno de pg_trgm ("  ana " -> "  a", " an", "ana", "na ")."""
+    resultado = set()
+    for palabra in texto.split():
+        relleno = f"  {palabra} "
+        resultado.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return resultado
+
+def _cobertura(consulta: str, nombre: set) -> float:
+    buscados = trigramas(consulta)
+    return len(buscados & nombre) / len(buscados) if buscados else 0.0
+
+def variantes(consulta: str) -> list:
+    """La consulta con dos letras vecinas intercambiadas en una palabra ("lius" -> "luis")."""
+    palabras = consulta.split()
+    resultado = []
+    for n, palabra in enumerate(palabras):
+        for i in range(len(palabra) - 1):
+            if palabra[i] != palabra[i + 1]:
+                cambiada = palabra[:i] + palabra[i + 1] + palabra[i] + palabra[i + 2:]
+                resultado.append(" ".join(palabras[:n] + [cambiada] + palabras[n + 1:]))
+    return resultado[:MAX_VARIANTES]
+
+def similitud(consulta: str, nombre: str) -> float:
+    """Parte de los trigramas de la consulta que aparecen en el nombre (como word_similarity);
+    una variante con letras cambiadas puntúa PENALIZACION_CAMBIO de lo que daría exacta."""
+    del_nombre = trigramas(nombre)
+    return max([_cobertura(consulta, del_nombre)] + [PENALIZACION_CAMBIO * _cobertura(v, del_nombre) for v in variantes(consulta)])
+
+# ---------- Índice ----------
+
+def _ddl_sqlite() -> list:
+    ddl = [f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(nombre, telefono, tokenize = 'trigram')"]
+    for k, (origen, tabla, columna) in enumerate(ORIGENES):
+        fila = f"(new.id * 3 + {k}, {_nombre_sql(f'new.{columna}')}, {_telefono_sql('new.telefono')})"
+        ddl += [
+            f"""CREATE TRIGGER IF NOT EXISTS {tabla}_personas_ai AFTER INSERT ON {tabla} BEGIN
+                INSERT INTO {FTS_TABLE}(rowid, nombre, telefono) VALUES {fila};
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {tabla}_personas_ad AFTER DELETE ON {tabla} BEGIN
+                DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 3 + {k};
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {tabla}_personas_au AFTER UPDATE OF {columna}, telefono ON {tabla} BEGIN
+                DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 3 + {k};
+                INSERT INTO {FTS_TABLE}(rowid, nombre, telefono) VALUES {fila};
+            END""",
+        ]
+    return ddl
+
+_pg_trgm = False
+
+def init_indice(engine):
+    """Crea el índice de personas y sus triggers; lo reconstruye si quedó desfasado.
+
+    Los triggers se recrean en cada arranque, así un índice armado con una
+    versión anterior de la normalización (nombres sin relleno) se actualiza.
+    """
+    global _pg_trgm
+    if engine.dialect.name == "postgresql":
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                for _, tabla, columna in ORIGENES:
+                    conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{tabla}_personas_nombre ON {tabla} USING gin (({_PG_NOMBRE.format(columna)}) gin_trgm_ops)"))
+                    conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{tabla}_personas_telefono ON {tabla} USING gin (({_PG_TELEFONO}) gin_trgm_ops)"))
+            _pg_trgm = True
+        except DBAPIError as e:
+            # Installing an extension needs privileges the app may not have
+            logger.warning("Sin pg_trgm (%s); la búsqueda de personas usa LIKE sin índice", e.orig)
+        return
+    with engine.begin() as conn:
+        for _, tabla, _ in ORIGENES:
+            for sufijo in ("ai", "ad", "au"):
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {tabla}_personas_{sufijo}"))
+        for ddl in _ddl_sqlite():
+            conn.execute(text(ddl))
+        indexadas = conn.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+        filas = sum(conn.execute(text(f"SELECT count(*) FROM {tabla}")).scalar() for _, tabla, _ in ORIGENES)
+        muestra = conn.execute(text(f"SELECT nombre FROM {FTS_TABLE} LIMIT 1")).scalar()
+        if indexadas != filas or (muestra is not None and not muestra.startswith("  ")):
+            rebuild_indice(conn)
+
+def rebuild_indice(conn):
+    conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    for k, (_, tabla, columna) in enumerate(ORIGENES):
+        conn.execute(text(
+            f"INSERT INTO {FTS_TABLE}(rowid, nombre, telefono) "
+            f"SELECT id * 3 + {k}, {_nombre_sql(columna)}, {_telefono_sql('telefono')} FROM {tabla}"
+        ))
+
+# ---------- Búsqueda ----------
+
+def _match_expression(consultas: list, tel: str) -> str:
+    # Any trigram of the query or its variants makes a candidate; scoring is later
+    buscados = set().union(*(trigramas(c) for c in consultas))
+    partes = ['"' + t.replace('"', '""') + '"' for t in sorted(buscados)]
+    expr = f"nombre : ({' OR '.join(partes)})" if partes else ""
+    if len(tel) >= 3:
+        expr = f'{expr} OR telefono : "{tel}"' if expr else f'telefono : "{tel}"'
+    return expr
+
+def _candidatos_sqlite(db: Session, consultas: list, tel: str):
+    expr = _match_expression(consultas, tel)
+    if not expr:
+        return []
+    filas = db.execute(text(
+        f"SELECT rowid, nombre, telefono FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :expr "
+        f"ORDER BY bm25({FTS_TABLE}) LIMIT :n"
+    ), {"expr": expr, "n": CANDIDATOS}).all()
+    return [(ORIGENES[rowid % 3][0], rowid // 3, nombre, telefono) for rowid, nombre, telefono in filas]
+
+def _candidatos_pg(db: Session, consultas: list, tel: str):
+    params = {f"q{i}": c for i, c in enumerate(consultas)}
+    params.update(tel=tel, n=CANDIDATOS)
+    if _pg_trgm:
+        # <% defaults to 0.6; candidates must reach what scoring keeps
+        db.execute(text("SELECT set_config('pg_trgm.word_similarity_threshold', :t, true)"), {"t": str(SIMILITUD_MINIMA)})
+    selects = []
+    for origen, tabla, columna in ORIGENES:
+        nombre = _PG_NOMBRE.format(columna)
+        # One OR branch per spelling, each one a GIN index scan
+        if _pg_trgm:
+            condiciones = [f":{q} <% {nombre}" for q in params if q.startswith("q")]
+        else:
+            condiciones = [f"{nombre} LIKE '%' || :{q} || '%'" for q in params if q.startswith("q")]
+        if len(tel) >= 3:
+            condiciones.append(f"{_PG_TELEFONO} LIKE '%' || :tel || '%'")
+        selects.append(f"(SELECT '{origen}', id, {nombre}, {_PG_TELEFONO} FROM {tabla} WHERE {' OR '.join(condiciones)} LIMIT :n)")
+    return [tuple(f) for f in db.execute(text(" UNION ALL ".join(selects)), params).all()]
+
+def buscar(db: Session, termino: str, limite: int = 10) -> list:
+    """Personas parecidas a `termino` (nombre o teléfono), con lo que tienen abierto."""
+    consulta = normalizar(re.sub(r"\d", " ", termino))
+    tel = digitos(termino)
+    consultas = [consulta] + variantes(consulta) if consulta else []
+    candidatos = (_candidatos_pg if db.bind.dialect.name == "postgresql" else _candidatos_sqlite)(db, consultas, tel)
+
+    grupos = {}
+    for origen, id_, nombre, telefono in candidatos:
+        nombre = " ".join(nombre.split())
+        puntaje = max(similitud(consulta, nombre), 1.0 if len(tel) >= 3 and tel in telefono else 0.0)
+        if puntaje < SIMILITUD_MINIMA:
+            continue
+        g = grupos.setdefault(nombre, {"puntaje": 0.0, "ids": defaultdict(set)})
+        g["puntaje"] = max(g["puntaje"], puntaje)
+        g["ids"][origen].add(id_)
+    elegidos = sorted(grupos.items(), key=lambda kv: (-kv[1]["puntaje"], kv[0]))[:limite]
+    return _detalle(db, elegidos)
+
+def _detalle(db: Session, elegidos: list) -> list:
+    # The matched rows give the spellings used for each person; open work is
+    # then loaded by those exact spellings through the name indexes. One
+    # query per table for all the people, split among them afterwards.
+    if not elegidos:
+        return []
+    P, T, C = models.Pedido, models.TrabajoFotocopia, models.Cliente
+    duenio = {  # origin -> {matched id: person}
+        origen: {i: n for n, (_, g) in enumerate(elegidos) for i in g["ids"].get(origen, ())}
+        for origen, _, _ in ORIGENES
+    }
+    nombres = [set() for _ in elegidos]
+    telefonos = [set() for _ in elegidos]
+    for origen, modelo, columna in (("pedido", P, P.cliente), ("trabajo", T, T.solicitante), ("cliente", C, C.nombre)):
+        if duenio[origen]:
+            for id_, nombre, telefono in db.execute(select(modelo.id, columna, modelo.telefono).where(modelo.id.in_(duenio[origen]))):
+                nombres[duenio[origen][id_]].add(nombre)
+                if telefono:
+                    telefonos[duenio[origen][id_]].add(telefono)
+    por_nombre = {nombre: n for n, grupo in enumerate(nombres) for nombre in grupo}
+
+    def repartir(filas, origen, columna):
+        # A row goes to whoever uses its spelling or matched it directly
+        resultado = [[] for _ in elegidos]
+        for fila in filas:
+            for n in {por_nombre.get(getattr(fila, columna)), duenio[origen].get(fila.id)} - {None}:
+                resultado[n].append(fila)
+                if fila.telefono:
+                    telefonos[n].add(fila.telefono)
+        return resultado
+
+    pedidos = repartir(
+        db.query(P).options(selectinload(P.libros), selectinload(P.pagos))
+        .filter(P.archivado == False, P.cliente.in_(list(por_nombre)) | P.id.in_(list(duenio["pedido"])))
+        .order_by(P.id).all(),
+        "pedido", "cliente",
+    )
+    trabajos = repartir(
+        db.query(T).options(selectinload(T.pagos))
+        .filter(T.estado != "entregado", T.solicitante.in_(list(por_nombre)) | T.id.in_(list(duenio["trabajo"])))
+        .order_by(T.id).all(),
+        "trabajo", "solicitante",
+    )
+    libreta = repartir(
+        db.query(C).filter(C.nombre.in_(list(por_nombre)) | C.id.in_(list(duenio["cliente"]))).order_by(C.id).all(),
+        "cliente", "nombre",
+    )
+    return [
+        {
+            "nombre": max(nombres[n], key=lambda s: (len(s), s)) if nombres[n] else nombre,
+            "telefonos": sorted(telefonos[n]),
+            "puntaje": round(g["puntaje"], 3),
+            "pedidos": pedidos[n],
+            "trabajos": trabajos[n],
+            "libreta": libreta[n],
+            "saldo_fiado": sum(c.saldo_total or 0 for c in libreta[n]),
+        }
+        for n, (nombre, g) in enumerate(elegidos)
+    ]
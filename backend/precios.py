@@ -0,0 +1,60 @@
+import math
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Optional
+
+from sqlalchemy import Float, Numeric, case, cast, func, select, update
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from . import models
+
+# precio_publico is always derived: ceil(costo_base * (1 + margen / 100)),
+# or costo_base for a category without a margin. calc_price computes it in
+# Python (imports, synthetic data) and precio_sql() in the database.
+
+# Amounts are rounded to cents before ceil(): 100 * 1.1 is 110.00000000000001
+# in floating point, and ceil() would turn that into 111. calc_price rounds
+# like the databases do (15 significant digits, then half up), where round()
+# would turn 22636.67 * 1.5 = 33955.005 into 33955.0.
+def calc_price(costo: float, margen: Optional[float]) -> float:
+    if margen is None:
+        return costo  # same as reprice for categories without a margin
+    precio = Decimal(f"{costo * (1 + margen / 100):.15g}")
+    return math.ceil(precio.quantize(Decimal("0.01"), ROUND_HALF_UP))
+
+def centavos(expr):
+    # PostgreSQL only rounds to n places on numeric
+    return cast(func.round(cast(expr, Numeric), 2), Float)
+
+class ceil(FunctionElement):
+    type = Float()
+    inherit_cache = True
+
+@compiles(ceil)
+def _ceil(element, compiler, **kw):
+    return "ceil(%s)" % compiler.process(element.clauses, **kw)
+
+@compiles(ceil, "sqlite")
+def _ceil_sqlite(element, compiler, **kw):
+    # SQLite is usually built without math functions
+    x = compiler.process(element.clauses, **kw)
+    return f"(CAST({x} AS INTEGER) + ({x} > CAST({x} AS INTEGER)))"
+
+def precio_sql():
+    """El precio de cada producto según su costo y el margen de su categoría."""
+    margen = (
+        select(models.Categoria.margen_porcentaje)
+        .where(models.Categoria.id == models.Producto.categoria_id)
+        .scalar_subquery()
+    )
+    return case(
+        (margen.is_(None), models.Producto.costo_base),
+        else_=ceil(centavos(models.Producto.costo_base * (1 + margen / 100))),
+    )
+
+def reprice(db, *criteria):
+    """Recalcula precio_publico (mismo cálculo que calc_price) en un solo UPDATE."""
+    db.execute(
+        update(models.Producto).where(*criteria).values(precio_publico=precio_sql())
+        .execution_options(synchronize_session=False)
+    )
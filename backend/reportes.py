@@ -0,0 +1,165 @@
+"""Resumen diario de cobros y fiados.
+
+Uso (desde la raíz del repo):
+
+    python -m backend.reportes reconstruir                # todo el historial
+    python -m backend.reportes reconstruir 2026-03-01 2026-03-31
+    python -m backend.reportes backfill                   # sólo si está vacío
+
+Conviene reconstruir con el local cerrado: los pagos que entren mientras
+corre pueden quedar contados dos veces o ninguna.
+"""
+import sys
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, event, func, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import insert_for
+
+# resumen_diario holds one row per (day, module, concept) with the summed
+# amount and the number of movements. Mapper events keep it current inside
+# the same flush that inserts or deletes a payment, seña or fiado movement,
+# so it commits or rolls back with it and always equals the aggregate of
+# the source rows; reports read a few hundred rows instead of every payment.
+NOTA_SENA = "Seña inicial"
+COBROS = {("encargos", "sena"), ("encargos", "pago"), ("fotocopias", "pago"), ("fiados", "abono")}
+DIAS_DEFAULT = 7
+
+def _clave_pago_pedido(p):
+    return "encargos", "sena" if p.nota == NOTA_SENA else "pago"
+
+def _clave_pago_fotocopia(p):
+    return "fotocopias", "pago"
+
+def _clave_transaccion(t):
+    return "fiados", t.tipo_operacion
+
+FUENTES = {
+    models.PagoPedido: _clave_pago_pedido,
+    models.PagoFotocopia: _clave_pago_fotocopia,
+    models.TransaccionFiado: _clave_transaccion,
+}
+
+# Payments moved to the archive (archivo.py) still count when rebuilding
+ARCHIVADOS = {models.PagoPedidoArchivo: _clave_pago_pedido}
+
+# ---------- Mantenimiento incremental ----------
+
+def _sumar(connection, fecha: date, modulo: str, concepto: str, monto: float, cantidad: int):
+    R = models.ResumenDiario
+    stmt = insert_for(R).values(fecha=fecha, modulo=modulo, concepto=concepto, monto=monto, cantidad=cantidad)
+    connection.execute(stmt.on_conflict_do_update(
+        index_elements=[R.fecha, R.modulo, R.concepto],
+        set_={"monto": R.monto + stmt.excluded.monto, "cantidad": R.cantidad + stmt.excluded.cantidad},
+    ))
+
+def _al_insertar(mapper, connection, target):
+    if target.fecha is not None:
+        _sumar(connection, target.fecha, *FUENTES[mapper.class_](target), target.monto or 0, 1)
+
+def _al_borrar(mapper, connection, target):
+    if target.fecha is not None:
+        _sumar(connection, target.fecha, *FUENTES[mapper.class_](target), -(target.monto or 0), -1)
+
+for _modelo in FUENTES:
+    event.listen(_modelo, "after_insert", _al_insertar)
+    event.listen(_modelo, "after_delete", _al_borrar)
+
+# ---------- Reconstrucción ----------
+
+def _agregar(conn, desde: Optional[date], hasta: Optional[date]) -> dict:
+    totales = defaultdict(lambda: [0.0, 0])
+    for modelo, clave in {**FUENTES, **ARCHIVADOS}.items():
+        T = modelo.__table__
+        detalle = T.c.nota if "nota" in T.c else T.c.tipo_operacion
+        q = (
+            select(T.c.fecha, detalle, func.coalesce(func.sum(T.c.monto), 0).label("monto"), func.count().label("cantidad"))
+            .where(T.c.fecha.is_not(None))
+            .group_by(T.c.fecha, detalle)
+        )
+        if desde:
+            q = q.where(T.c.fecha >= desde)
+        if hasta:
+            q = q.where(T.c.fecha <= hasta)
+        for fila in conn.execute(q):
+            total = totales[(fila.fecha, *clave(fila))]
+            total[0] += fila.monto
+            total[1] += fila.cantidad
+    return totales
+
+def reconstruir(conn, desde: Optional[date] = None, hasta: Optional[date] = None) -> int:
+    """Recalcula el resumen (del rango, o completo) desde las tablas de origen."""
+    R = models.ResumenDiario
+    borrar = delete(R)
+    if desde:
+        borrar = borrar.where(R.fecha >= desde)
+    if hasta:
+        borrar = borrar.where(R.fecha <= hasta)
+    conn.execute(borrar)
+    filas = [
+        {"fecha": d, "modulo": modulo, "concepto": concepto, "monto": monto, "cantidad": cantidad}
+        for (d, modulo, concepto), (monto, cantidad) in _agregar(conn, desde, hasta).items()
+    ]
+    if filas:
+        conn.execute(R.__table__.insert(), filas)
+    return len(filas)
+
+def backfill(engine) -> Optional[int]:
+    """Arma el resumen de una base que todavía no lo tiene."""
+    with engine.begin() as conn:
+        if conn.execute(select(models.ResumenDiario.fecha).limit(1)).first() is not None:
+            return None
+        return reconstruir(conn)
+
+# ---------- Consultas ----------
+
+def rango(desde: Optional[date], hasta: Optional[date]):
+    hasta = hasta or date.today()
+    desde = desde or hasta - timedelta(days=DIAS_DEFAULT - 1)
+    if desde > hasta:
+        raise HTTPException(400, "'desde' no puede ser posterior a 'hasta'")
+    return desde, hasta
+
+def diario(db: Session, desde: date, hasta: date, modulo: Optional[str] = None):
+    R = models.ResumenDiario
+    q = select(R).where(R.fecha.between(desde, hasta))
+    if modulo:
+        q = q.where(R.modulo == modulo)
+    return db.scalars(q.order_by(R.fecha, R.modulo, R.concepto)).all()
+
+def totales(db: Session, desde: date, hasta: date) -> dict:
+    R = models.ResumenDiario
+    filas = db.execute(
+        select(R.modulo, R.concepto, func.sum(R.monto).label("monto"), func.sum(R.cantidad).label("cantidad"))
+        .where(R.fecha.between(desde, hasta))
+        .group_by(R.modulo, R.concepto)
+        .order_by(R.modulo, R.concepto)
+    ).all()
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "cobrado": sum(f.monto for f in filas if (f.modulo, f.concepto) in COBROS),
+        "conceptos": [f._asdict() for f in filas],
+    }
+
+def main(args):
+    from .database import engine
+    models.Base.metadata.create_all(bind=engine)
+    if args[:1] == ["backfill"]:
+        n = backfill(engine)
+        print("El resumen ya tenía datos, no se tocó." if n is None else f"{n} filas de resumen creadas.")
+    elif args[:1] == ["reconstruir"]:
+        fechas = [date.fromisoformat(a) for a in args[1:3]]
+        with engine.begin() as conn:
+            n = reconstruir(conn, *fechas)
+        print(f"{n} filas de resumen recalculadas.")
+    else:
+        print(__doc__)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
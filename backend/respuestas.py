@@ -0,0 +1,56 @@
+import os
+import time
+from functools import lru_cache
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from .metricas import sumar_serializacion
+
+# Opt-in fast path for the big list endpoints (FAST_JSON=1). The endpoint
+# converts its ORM rows with a single pydantic-core validate + dump_json in
+# its own worker thread and returns the bytes, instead of handing the rows
+# back for FastAPI to validate in a second threadpool hop and serialize on
+# the event loop (or, on older FastAPI, through jsonable_encoder and json).
+FAST_JSON = os.environ.get("FAST_JSON", "0") == "1"
+
+# Responses at least this big are compressed (brotli when brotli-asgi is
+# installed and the client accepts it, gzip otherwise). 0 disables it.
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", 1024))
+COMPRESSION_LEVEL = int(os.environ.get("COMPRESSION_LEVEL", 5))
+
+@lru_cache(maxsize=None)
+def _adapter(schema) -> TypeAdapter:
+    return TypeAdapter(list[schema])
+
+def serializar(schema, items) -> bytes:
+    """JSON de una lista de objetos ORM según el schema, sin pasos intermedios."""
+    inicio = time.perf_counter()
+    adapter = _adapter(schema)
+    body = adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+    sumar_serializacion(time.perf_counter() - inicio)
+    return body
+
+def lista(schema, items, response: Response):
+    """Devuelve items tal cual o, con FAST_JSON, ya serializados.
+
+    Los headers puestos en response (paginación) se copian a la respuesta
+    nueva, porque FastAPI no los agrega cuando el endpoint devuelve una.
+    """
+    if not FAST_JSON:
+        return items
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return Response(serializar(schema, items), media_type="application/json", headers=headers)
+
+def add_compression(app):
+    if COMPRESSION_MIN_BYTES <= 0:
+        return
+    try:
+        from brotli_asgi import BrotliMiddleware
+    except ImportError:
+        from starlette.middleware.gzip import GZipMiddleware
+        app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_BYTES, compresslevel=COMPRESSION_LEVEL)
+    else:
+        app.add_middleware(
+            BrotliMiddleware, quality=COMPRESSION_LEVEL, minimum_size=COMPRESSION_MIN_BYTES, gzip_fallback=True,
+        )
@@ -1,5 +1,15 @@
-from pydantic import BaseModel, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, BeforeValidator, ConfigDict
+from datetime import date
+from typing import Annotated, List, Optional
+
+def _fecha(v):
+    # The Libreta screen used to send d/m/yyyy
+    if isinstance(v, str) and "/" in v:
+        d, m, a = v.split("/")
+        return date(int(a), int(m), int(d))
+    return v
+
+Fecha = Annotated[date, BeforeValidator(_fecha)]
 
 class Token(BaseModel):
     access_token: str
@@ -26,6 +36,10 @@ class Producto(ProductoCreate):
     id: int
     precio_publico: Optional[float] = None
 
+class AumentoCostos(BaseModel):
+    categoria_ids: List[int]
+    porcentaje: float
+
 # ===== ENCARGOS =====
 
 class LibroCatalogoCreate(BaseModel):
@@ -57,32 +71,45 @@ class LibroPedido(LibroPedidoCreate):
     id: int
     pedido_id: int
 
+class CambioEstado(BaseModel):
+    id: int
+    estado: str
+
 class PagoPedidoCreate(BaseModel):
     monto: float
-    fecha: str
+    fecha: Fecha
     nota: Optional[str] = None
 
 class PagoPedido(PagoPedidoCreate):
     model_config = ConfigDict(from_attributes=True)
     id: int
+    fecha: Optional[date] = None
     pedido_id: int
 
 class PedidoCreate(BaseModel):
     cliente: str
     telefono: Optional[str] = None
-    fecha: str
-    fecha_tentativa: Optional[str] = None
+    fecha: Fecha
+    fecha_tentativa: Optional[Fecha] = None
     archivado: bool = False
     libros: List[LibroPedidoCreate] = []
     sena: float = 0  # initial payment
 
+class PedidoDesdeGrado(BaseModel):
+    cliente: str
+    telefono: Optional[str] = None
+    fecha: Fecha
+    fecha_tentativa: Optional[Fecha] = None
+    sena: float = 0
+    excluir: List[int] = []  # LibroCatalogo ids left out of the pack
+
 class Pedido(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: int
     cliente: str
     telefono: Optional[str] = None
-    fecha: str
-    fecha_tentativa: Optional[str] = None
+    fecha: Optional[date] = None  # NULL when the old text date was unreadable
+    fecha_tentativa: Optional[date] = None
     archivado: bool = False
     libros: List[LibroPedido] = []
     pagos: List[PagoPedido] = []
@@ -119,12 +146,13 @@ class AnioFotocopia(AnioFotocopiaCreate):
 
 class PagoFotocopiaCreate(BaseModel):
     monto: float
-    fecha: str
+    fecha: Fecha
     nota: Optional[str] = None
 
 class PagoFotocopia(PagoFotocopiaCreate):
     model_config = ConfigDict(from_attributes=True)
     id: int
+    fecha: Optional[date] = None
     trabajo_id: int
 
 class TrabajoFotocopiaCreate(BaseModel):
@@ -134,17 +162,26 @@ class TrabajoFotocopiaCreate(BaseModel):
     precio: float = 0
     telefono: Optional[str] = None
     estado: str = "pendiente"
-    fecha: str
+    fecha: Fecha
 
 class TrabajoFotocopia(TrabajoFotocopiaCreate):
     model_config = ConfigDict(from_attributes=True)
     id: int
+    fecha: Optional[date] = None
     pagos: List[PagoFotocopia] = []
 
+class ResumenCola(BaseModel):
+    estado: str
+    trabajos: int
+    copias: int
+    importe: float
+    pagado: float
+    adeudado: float
+
 # ===== LIBRETA =====
 
 class TransaccionCreate(BaseModel):
-    fecha: str
+    fecha: Fecha
     detalle: str
     tipo_operacion: str
     monto: float
@@ -152,6 +189,7 @@ class TransaccionCreate(BaseModel):
 class Transaccion(TransaccionCreate):
     model_config = ConfigDict(from_attributes=True)
     id: int
+    fecha: Optional[date] = None
     cliente_id: int
 
 class ClienteCreate(BaseModel):
@@ -163,3 +201,39 @@ class Cliente(ClienteCreate):
     id: int
     saldo_total: float
     transacciones: List[Transaccion] = []
+
+class ClienteSaldo(ClienteCreate):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    saldo_total: float
+
+class PersonaEncontrada(BaseModel):
+    nombre: str
+    telefonos: List[str]
+    puntaje: float
+    pedidos: List[Pedido]  # open ones
+    trabajos: List[TrabajoFotocopia]  # not yet delivered
+    libreta: List[ClienteSaldo]
+    saldo_fiado: float
+
+# ===== REPORTES =====
+
+class ResumenDia(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    fecha: date
+    modulo: str
+    concepto: str
+    monto: float
+    cantidad: int
+
+class TotalConcepto(BaseModel):
+    modulo: str
+    concepto: str
+    monto: float
+    cantidad: int
+
+class ResumenTotales(BaseModel):
+    desde: date
+    hasta: date
+    cobrado: float
+    conceptos: List[TotalConcepto]
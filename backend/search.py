@@ -0,0 +1,101 @@
+import re
+import unicodedata
+from sqlalchemy import text, table, column, literal_column, func, false
+
+# On SQLite: an FTS5 index over productos. It keeps its own copy of the
+# searchable text (ISBN without dashes so "9789501234" finds "978-950-12-34")
+# and is kept in sync by triggers, so every write path (ORM or bulk SQL)
+# updates it. On PostgreSQL the same search runs on a GIN expression index
+# (see _PG_DOCUMENTO), which the server maintains by itself.
+FTS_TABLE = "productos_fts"
+ISBN_WEIGHT = 10.0
+DESCRIPCION_WEIGHT = 1.0
+
+productos_fts = table(FTS_TABLE, column("rowid"), column("isbn"), column("descripcion"))
+
+_ISBN_SQL = "replace(replace(coalesce({0}.isbn, ''), '-', ''), ' ', '')"
+
+_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        isbn, descripcion, tokenize = "unicode61 remove_diacritics 2"
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS productos_fts_ai AFTER INSERT ON productos BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, isbn, descripcion)
+        VALUES (new.id, {_ISBN_SQL.format('new')}, coalesce(new.descripcion, ''));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS productos_fts_ad AFTER DELETE ON productos BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS productos_fts_au AFTER UPDATE OF isbn, descripcion ON productos BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, isbn, descripcion)
+        VALUES (new.id, {_ISBN_SQL.format('new')}, coalesce(new.descripcion, ''));
+    END""",
+]
+
+_PG_DOCUMENTO = (
+    "to_tsvector('simple', translate(lower(replace(coalesce(isbn, ''), '-', '') || ' ' || "
+    "coalesce(descripcion, '')), 'áàâäéèêëíìîïóòôöúùûüñç', 'aaaaeeeeiiiioooouuuunc'))"
+)
+
+def init_fts(engine):
+    """Crea el índice FTS y sus triggers; lo reconstruye si quedó desfasado."""
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_productos_busqueda ON productos USING gin (({_PG_DOCUMENTO}))"))
+        return
+    with engine.begin() as conn:
+        for ddl in _DDL:
+            conn.execute(text(ddl))
+        indexados = conn.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+        productos = conn.execute(text("SELECT count(*) FROM productos")).scalar()
+        if indexados != productos:
+            rebuild_fts(conn)
+
+def rebuild_fts(conn):
+    conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    conn.execute(text(
+        f"INSERT INTO {FTS_TABLE}(rowid, isbn, descripcion) "
+        f"SELECT id, {_ISBN_SQL.format('productos')}, coalesce(descripcion, '') FROM productos"
+    ))
+
+def palabras(termino: str) -> list:
+    """Palabras a buscar; los guiones entre dígitos se eliminan para que los
+    ISBN coincidan con o sin separadores."""
+    termino = re.sub(r"(?<=\d)-(?=\d)", "", termino)
+    return re.findall(r"\w+", termino)
+
+def match_expression(termino: str) -> str:
+    """Convierte lo tipeado en el buscador en una consulta FTS5 por prefijo.
+
+    Cada palabra se busca como prefijo y todas deben aparecer ("mate 2" ->
+    "mate"* "2"*).
+    """
+    return " ".join(f'"{p}"*' for p in palabras(termino))
+
+def tsquery_expression(termino: str) -> str:
+    """Equivalente de match_expression para to_tsquery de PostgreSQL."""
+    sin_acentos = unicodedata.normalize("NFD", termino).encode("ascii", "ignore").decode()
+    return " & ".join(f"{p.lower()}:*" for p in palabras(sin_acentos))
+
+def filter_productos(query, model, termino: str, dialect: str = "sqlite"):
+    """Restringe y ordena por relevancia una consulta (Query o select) de Producto."""
+    if dialect == "postgresql":
+        return _filter_productos_pg(query, model, termino)
+    expr = match_expression(termino)
+    if not expr:
+        return query.filter(false())
+    fts = literal_column(FTS_TABLE)
+    return (
+        query.join(productos_fts, productos_fts.c.rowid == model.id)
+        .filter(fts.op("MATCH")(expr))
+        .order_by(func.bm25(fts, ISBN_WEIGHT, DESCRIPCION_WEIGHT), model.id)
+    )
+
+def _filter_productos_pg(query, model, termino: str):
+    expr = tsquery_expression(termino)
+    if not expr:
+        return query.filter(false())
+    documento = literal_column(_PG_DOCUMENTO)
+    consulta = func.to_tsquery("simple", expr)
+    return query.filter(documento.op("@@")(consulta)).order_by(func.ts_rank(documento, consulta).desc(), model.id)
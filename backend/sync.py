@@ -0,0 +1,114 @@
+import base64
+import binascii
+import json
+import os
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, event, insert, or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Delta sync for clients that keep a local copy. Every synced table has an
+# updated_at that inserts and updates (ORM or Core) refresh, and ORM deletes
+# leave a row in `bajas`. /api/sync returns, per table, the rows changed
+# after the client's cursor plus the ids deleted since then.
+#
+# The cursor is opaque to the client: per stream it holds the (timestamp,
+# id) of the last row seen, so a page can end in the middle of rows sharing
+# a timestamp (bulk updates do that). updated_at is set when the row is
+# flushed, not when it commits, so a transaction still running could commit
+# rows older than what a client already read; a complete page therefore
+# rewinds its position to SYNC_MARGEN_SEGUNDOS ago and the client may see a
+# row twice. Rows are upserted by id, so that is harmless.
+LIMITE = int(os.environ.get("SYNC_LIMITE", 2000))
+MARGEN_SEGUNDOS = float(os.environ.get("SYNC_MARGEN_SEGUNDOS", 5))
+BAJAS_DIAS = int(os.environ.get("SYNC_BAJAS_DIAS", 90))
+
+MODELOS = [
+    models.Pedido, models.LibroPedido, models.PagoPedido, models.StockLibro,
+    models.TrabajoFotocopia, models.Cliente, models.TransaccionFiado,
+]
+BAJAS = "bajas"
+
+# ---------- Bajas ----------
+
+def _registrar_baja(mapper, connection, target):
+    connection.execute(insert(models.Baja).values(tabla=mapper.local_table.name, fila_id=target.id))
+
+for _modelo in MODELOS:
+    event.listen(_modelo, "after_delete", _registrar_baja)
+
+def purgar_bajas(engine):
+    """Borra las bajas más viejas que SYNC_BAJAS_DIAS."""
+    with engine.begin() as conn:
+        conn.execute(delete(models.Baja).where(models.Baja.deleted_at < _horizonte()))
+
+def _horizonte() -> datetime:
+    return models.ahora() - timedelta(days=BAJAS_DIAS)
+
+# ---------- Cursor ----------
+
+def _leer_cursor(since: str) -> dict:
+    try:
+        crudo = json.loads(base64.urlsafe_b64decode(since.encode() + b"=" * (-len(since) % 4)))
+        return {nombre: (datetime.fromisoformat(ts), int(id_)) for nombre, (ts, id_) in crudo.items()}
+    except (binascii.Error, ValueError, TypeError, AttributeError):
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Cursor de sincronización inválido")
+
+def _escribir_cursor(posiciones: dict) -> str:
+    crudo = {nombre: [ts.isoformat(), id_] for nombre, (ts, id_) in posiciones.items()}
+    return base64.urlsafe_b64encode(json.dumps(crudo, separators=(",", ":")).encode()).decode().rstrip("=")
+
+# ---------- Consulta ----------
+
+def _pagina(db: Session, stmt, ts_col, id_col, desde, limite: int):
+    if desde is not None:
+        ts, id_ = desde
+        # The >= bound is what lets the index do the range scan
+        stmt = stmt.where(ts_col >= ts, or_(ts_col > ts, id_col > id_))
+    return db.execute(stmt.order_by(ts_col, id_col).limit(limite + 1)).all()
+
+def cambios(db: Session, since: str = None, limite: int = LIMITE) -> dict:
+    """Filas modificadas y bajas posteriores al cursor `since` (None = todo)."""
+    posiciones = _leer_cursor(since) if since else {}
+    if since and (BAJAS not in posiciones or posiciones[BAJAS][0] < _horizonte()):
+        # Older bajas were purged: the client can't know what it missed
+        raise HTTPException(status.HTTP_410_GONE, "El cursor es demasiado viejo, sincronizá desde cero")
+    tope = (models.ahora() - timedelta(seconds=MARGEN_SEGUNDOS), 0)
+    resultado = {"cursor": None, "mas": False, "cambios": {}, "bajas": {}}
+
+    def avanzar(nombre, filas, ts_col, id_col):
+        if len(filas) > limite:
+            del filas[limite:]
+            resultado["mas"] = True
+            ultima = filas[-1]._mapping
+            posiciones[nombre] = (ultima[ts_col], ultima[id_col])
+        else:
+            posiciones[nombre] = max(posiciones.get(nombre, tope), tope)
+
+    for modelo in MODELOS:
+        T = modelo.__table__
+        filas = _pagina(db, select(T), T.c.updated_at, T.c.id, posiciones.get(T.name), limite)
+        avanzar(T.name, filas, T.c.updated_at, T.c.id)
+        if filas:
+            resultado["cambios"][T.name] = [dict(f._mapping) for f in filas]
+
+    B = models.Baja.__table__
+    filas = _pagina(db, select(B.c.id, B.c.tabla, B.c.fila_id, B.c.deleted_at), B.c.deleted_at, B.c.id, posiciones.get(BAJAS), limite)
+    avanzar(BAJAS, filas, B.c.deleted_at, B.c.id)
+    # A row changed and deleted in the same page (or deleted and its id
+    # reused) only goes out in its latest state, so the client can apply
+    # both lists in any order.
+    enviadas = {(tabla, c["id"]): c for tabla, cs in resultado["cambios"].items() for c in cs}
+    for f in filas:
+        fila = enviadas.get((f.tabla, f.fila_id))
+        if fila is not None:
+            if fila["updated_at"] > f.deleted_at:
+                continue
+            resultado["cambios"][f.tabla].remove(fila)
+        resultado["bajas"].setdefault(f.tabla, []).append(f.fila_id)
+
+    resultado["cursor"] = _escribir_cursor(posiciones)
+    return resultado
@@ -0,0 +1,55 @@
+"""Pruebas de la API sobre la base de TEST_DATABASE_URL (SQLite temporal si no está).
+
+Uso (desde la raíz del repo):
+
+    python -m pytest backend/tests
+    TEST_DATABASE_URL=postgresql://postgres@localhost:5432/libreria_test python -m pytest backend/tests
+    python -m backend.tests.matriz            # SQLite y TEST_POSTGRES_URL, sync y async
+
+Para PostgreSQL alcanza con un contenedor descartable:
+
+    docker run -d --rm -p 5432:5432 -e POSTGRES_HOST_AUTH_METHOD=trust -e POSTGRES_DB=libreria_test postgres:16
+
+La base de PostgreSQL se vacía al empezar. La app lee la configuración al
+importarse, así que cada base es una corrida de pytest aparte.
+"""
+import os
+import tempfile
+
+import pytest
+
+# Before anything imports backend.database
+_tmp = tempfile.mkdtemp(prefix="libreria-test-")
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{_tmp}/libreria.db"
+os.environ.pop("ARCHIVO_DB", None)
+os.environ["FORWARDED_ALLOW_IPS"] = "testclient"  # TestClient's address, as if it were the proxy
+
+from sqlalchemy import text  # noqa: E402
+
+from backend import database  # noqa: E402
+
+if database.engine.dialect.name == "postgresql":
+    with database.engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {database.ARCHIVO_SCHEMA} CASCADE"))
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from backend.main import app  # noqa: E402
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        r = c.post("/api/token", data={"username": "Admin", "password": "Epaminondas01"})
+        c.headers["Authorization"] = f"Bearer {r.json()['access_token']}"
+        yield c
+
+@pytest.fixture
+def db():
+    with database.SessionLocal() as session:
+        yield session
+
+@pytest.fixture
+def dialecto():
+    return database.engine.dialect.name
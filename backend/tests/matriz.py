@@ -0,0 +1,42 @@
+"""Corre las pruebas sobre cada base y modo: SQLite y PostgreSQL, sync y async.
+
+Uso (desde la raíz del repo):
+
+    python -m backend.tests.matriz
+    TEST_POSTGRES_URL=postgresql://postgres@localhost:5432/libreria_test python -m backend.tests.matriz
+    python -m backend.tests.matriz -- -k archivo      # lo que sigue a -- va a pytest
+
+Sin TEST_POSTGRES_URL sólo corre SQLite y lo avisa. La app lee la
+configuración al importarse, así que cada combinación es un pytest aparte.
+"""
+import os
+import subprocess
+import sys
+
+def combinaciones():
+    bases = [("sqlite", "")]
+    if os.environ.get("TEST_POSTGRES_URL"):
+        bases.append(("postgresql", os.environ["TEST_POSTGRES_URL"]))
+    else:
+        print("TEST_POSTGRES_URL no está definida: se omite PostgreSQL")
+    for nombre, url in bases:
+        for modo in ("0", "1"):
+            yield f"{nombre} DB_ASYNC={modo}", {"TEST_DATABASE_URL": url, "DB_ASYNC": modo}
+
+def main(args):
+    extra = args[args.index("--") + 1:] if "--" in args else []
+    resultados = []
+    for nombre, entorno in combinaciones():
+        print(f"== {nombre}", flush=True)
+        codigo = subprocess.call(
+            [sys.executable, "-m", "pytest", "-q", os.path.dirname(__file__), *extra],
+            env={**os.environ, **entorno},
+        )
+        resultados.append((nombre, codigo))
+    print()
+    for nombre, codigo in resultados:
+        print(f"{'ok   ' if codigo == 0 else 'FALLA'} {nombre}")
+    return max(codigo for _, codigo in resultados)
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,180 @@
+"""Lo que cambia según la base: búsquedas, fechas, upserts, archivo y migraciones.
+
+Corre igual sobre SQLite y PostgreSQL (ver conftest.py); cada prueba usa
+nombres propios para no chocar con las demás.
+"""
+import threading
+import time
+from datetime import date, datetime
+
+from sqlalchemy import Column, Date, Integer, MetaData, String, Table, inspect, text, update
+
+from backend import database, main, migrations, models, precios
+
+def test_busqueda_de_productos_ignora_acentos_y_guiones(client):
+    cat = client.post("/api/categorias/", json={"nombre": "Texto escolar", "margen_porcentaje": 30}).json()
+    client.post("/api/productos/", json={"descripcion": "Matemática Zorzal 4", "isbn": "978-950-11-2233", "costo_base": 100, "categoria_id": cat["id"]})
+    client.post("/api/productos/", json={"descripcion": "Lengua Zorzal 4", "costo_base": 100, "categoria_id": cat["id"]})
+
+    encontrados = client.get("/api/productos/", params={"search": "matematica zorz"}).json()
+    assert [p["descripcion"] for p in encontrados] == ["Matemática Zorzal 4"]
+    assert [p["descripcion"] for p in client.get("/api/productos/", params={"search": "9789501122"}).json()] == ["Matemática Zorzal 4"]
+
+def test_aumento_de_costos_redondea_a_centavos(client):
+    cat = client.post("/api/categorias/", json={"nombre": "Aumento", "margen_porcentaje": 50}).json()
+    p = client.post("/api/productos/", json={"descripcion": "Cuaderno Aumento", "costo_base": 100, "categoria_id": cat["id"]}).json()
+    client.post("/api/categorias/aumento-costos", json={"categoria_ids": [cat["id"]], "porcentaje": 10})
+    p = next(x for x in client.get("/api/productos/", params={"after_id": p["id"] - 1, "limit": 1}).json())
+    assert (p["costo_base"], p["precio_publico"]) == (110, 165)
+
+def test_stock_se_suma_por_titulo_y_tipo(client):
+    for cantidad in (2, 3):
+        client.post("/api/stock/", json={"titulo": "Stock Upsert 1", "cantidad": cantidad})
+    client.post("/api/stock/", json={"titulo": "Stock Upsert 1", "tipo": "usado", "cantidad": 1})
+    filas = [s for s in client.get("/api/stock/", params={"limit": 500}).json() if s["titulo"] == "Stock Upsert 1"]
+    assert sorted((s["tipo"], s["cantidad"]) for s in filas) == [("nuevo", 5), ("usado", 1)]
+
+def test_dos_entregas_a_la_vez_descuentan_una_vez(client, db):
+    p = client.post("/api/pedidos/", json={"cliente": "Entrega Doble", "fecha": "2026-03-01", "libros": [{"titulo": "Entrega Doble 1"}]}).json()
+    libro = p["libros"][0]["id"]
+    client.post("/api/stock/", json={"titulo": "Entrega Doble 1", "cantidad": 3})  # assigns the book
+    stock = lambda: next(s["cantidad"] for s in client.get("/api/stock/", params={"limit": 500}).json() if s["titulo"] == "Entrega Doble 1")
+    antes = stock()
+
+    errores = []
+    def entregar(session, espera=None):
+        try:
+            main.aplicar_estados(session, {libro: "entregado"})
+            if espera:
+                espera.wait()
+            session.commit()
+        except Exception as e:
+            errores.append(e)
+        finally:
+            session.close()
+
+    # The first clerk holds its transaction open while the second one arrives
+    primera = threading.Event()
+    hilos = [threading.Thread(target=entregar, args=(database.SessionLocal(), primera))]
+    hilos[0].start(); time.sleep(0.3)
+    hilos.append(threading.Thread(target=entregar, args=(database.SessionLocal(),)))
+    hilos[1].start(); time.sleep(0.3)
+    primera.set()
+    for h in hilos:
+        h.join()
+
+    assert not errores
+    assert stock() == antes - 1
+
+def test_fechas_filtran_por_rango_y_vencidos(client):
+    ids = [
+        client.post("/api/pedidos/", json={"cliente": f"Rango {f}", "fecha": f, "fecha_tentativa": "2/1/2001"}).json()["id"]
+        for f in ("1/2/2001", "15/2/2001", "1/3/2001")
+    ]
+    en_febrero = client.get("/api/pedidos/", params={"desde": "2001-02-01", "hasta": "2001-02-28", "limit": 500}).json()
+    assert [p["id"] for p in en_febrero] == ids[:2]
+    assert en_febrero[0]["fecha"] == "2001-02-01"
+    vencidos = {p["id"] for p in client.get("/api/pedidos/vencidos/", params={"al": "2001-01-03", "limit": 500}).json()}
+    assert set(ids) <= vencidos
+
+def test_buscador_de_personas_tolera_errores(client):
+    client.post("/api/clientes/", json={"nombre": "Luis Quiroga", "telefono": "11 4000-9911"})
+    client.post("/api/pedidos/", json={"cliente": "LUIS QUIROGA", "fecha": "2026-03-01", "libros": [{"titulo": "Mate 3"}]})
+
+    for q in ("Lius Quiroga", "luis quirga", "quiroga", "40009911"):
+        personas = client.get("/api/personas/buscar", params={"q": q}).json()
+        assert personas and "quiroga" in personas[0]["nombre"].lower(), q
+    primero = client.get("/api/personas/buscar", params={"q": "Luis Quiroga"}).json()[0]
+    assert len(primero["pedidos"]) == 1 and len(primero["libreta"]) == 1
+
+def test_cola_pagina_trabajos_sin_fecha(client, db):
+    estado = "listo"
+    antes = {t["id"] for t in client.get("/api/trabajos-fotocopia/cola", params={"estado": estado, "limit": 500}).json()}
+    ids = [
+        client.post("/api/trabajos-fotocopia/", json={"solicitante": "Cola", "material": "m", "estado": estado, "fecha": f}).json()["id"]
+        for f in ("2026-05-03", "2026-05-01", "2026-05-02")
+    ]
+    db.execute(update(models.TrabajoFotocopia).where(models.TrabajoFotocopia.id == ids[1]).values(fecha=None)); db.commit()
+
+    vistos, after = [], None
+    while True:
+        r = client.get("/api/trabajos-fotocopia/cola", params={"estado": estado, "limit": 1, **({"after_id": after} if after else {})})
+        vistos += [t["id"] for t in r.json()]
+        after = r.headers.get("X-Next-After-Id")
+        if not after:
+            break
+    nuevos = [i for i in vistos if i not in antes]
+    assert nuevos == [ids[2], ids[0], ids[1]]  # by fecha, without fecha last
+
+def test_resumen_de_cobros_y_sync(client):
+    cursor = client.get("/api/sync").json()["cursor"]
+    total = lambda: client.get("/api/reportes/totales", params={"desde": "2001-06-01", "hasta": "2001-06-30"}).json()["cobrado"]
+    antes = total()
+    p = client.post("/api/pedidos/", json={"cliente": "Sync Uno", "fecha": "2001-06-10", "sena": 40}).json()
+    client.post(f"/api/pedidos/{p['id']}/pagos/", json={"monto": 10, "fecha": "2001-06-11"})
+    assert total() == antes + 50
+
+    delta = client.get("/api/sync", params={"since": cursor}).json()
+    assert p["id"] in [x["id"] for x in delta["cambios"]["pedidos"]]
+    client.delete(f"/api/pedidos/{p['id']}")
+    assert p["id"] in client.get("/api/sync", params={"since": delta["cursor"]}).json()["bajas"].get("pedidos", [])
+    assert total() == antes
+
+def test_archivo_mueve_y_restaura(client, db):
+    p = client.post("/api/pedidos/", json={"cliente": "Archivo Viejo", "fecha": "2001-07-01", "sena": 25, "libros": [{"titulo": "Mate 3"}]}).json()
+    viejo = datetime(2001, 7, 1)
+    db.execute(update(models.Pedido).where(models.Pedido.id == p["id"]).values(archivado=True, updated_at=viejo)); db.commit()
+    total = lambda: client.get("/api/reportes/totales", params={"desde": "2001-07-01", "hasta": "2001-07-01"}).json()["cobrado"]
+    antes = total()
+
+    assert client.post("/api/archivo/archivar", params={"dias": 365}).json()["movidos"] >= 1
+    encontrados = client.get("/api/archivo/pedidos/", params={"search": "Archivo Viejo"}).json()
+    assert [(a["id"], len(a["libros"]), len(a["pagos"])) for a in encontrados] == [(p["id"], 1, 1)]
+    assert db.get(models.Pedido, p["id"]) is None
+    assert total() == antes
+
+    restaurado = client.post(f"/api/archivo/pedidos/{p['id']}/restaurar").json()
+    assert (restaurado["id"], len(restaurado["libros"]), len(restaurado["pagos"])) == (p["id"], 1, 1)
+    assert client.post(f"/api/archivo/pedidos/{p['id']}/restaurar").status_code == 404
+
+def test_migracion_de_fechas_respeta_el_esquema():
+    # The same table name in the main schema (old text dates) and in the
+    # archive one (already DATE, other columns): only the first is rebuilt.
+    engine = database.engine
+    viejo, nuevo = MetaData(), MetaData()
+    Table("prueba_fechas", viejo, Column("id", Integer, primary_key=True), Column("fecha", String))
+    Table("prueba_fechas", viejo, Column("id", Integer, primary_key=True), Column("fecha", Date), Column("extra", String), schema=database.ARCHIVO_SCHEMA)
+    Table("prueba_fechas", nuevo, Column("id", Integer, primary_key=True), Column("fecha", Date, index=True))
+    Table("prueba_fechas", nuevo, Column("id", Integer, primary_key=True), Column("fecha", Date), Column("extra", String), schema=database.ARCHIVO_SCHEMA)
+    viejo.drop_all(engine)
+    viejo.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO prueba_fechas (id, fecha) VALUES (1, '3/1/2024'), (2, '2024-02-05'), (3, 'basura')"))
+        conn.execute(text(f"INSERT INTO {database.ARCHIVO_SCHEMA}.prueba_fechas (id, fecha, extra) VALUES (1, '2020-01-01', 'x')"))
+    try:
+        migrations.upgrade(engine, nuevo)
+        with engine.connect() as conn:
+            tipos = {c["name"]: c["type"] for c in inspect(conn).get_columns("prueba_fechas")}
+            assert isinstance(tipos["fecha"], Date)
+            filas = conn.execute(text("SELECT id, fecha FROM prueba_fechas ORDER BY id")).all()
+            assert [(i, f if isinstance(f, date) else f and date.fromisoformat(f)) for i, f in filas] == [
+                (1, date(2024, 1, 3)), (2, date(2024, 2, 5)), (3, None),
+            ]
+            assert conn.execute(text(f"SELECT extra FROM {database.ARCHIVO_SCHEMA}.prueba_fechas")).scalar() == "x"
+    finally:
+        nuevo.drop_all(engine)
+
+def test_migracion_corrige_precios_con_el_redondeo_viejo(client, db):
+    cat = client.post("/api/categorias/", json={"nombre": "Redondeo viejo", "margen_porcentaje": 10}).json()
+    p = client.post("/api/productos/", json={"descripcion": "Regla Redondeo Viejo", "costo_base": 100, "categoria_id": cat["id"]}).json()
+    # ceil(100 * 1.1) without rounding to cents first
+    db.execute(update(models.Producto).where(models.Producto.id == p["id"]).values(precio_publico=111)); db.commit()
+    migrations.upgrade(database.engine, models.Base.metadata)
+    db.expire_all()
+    assert db.get(models.Producto, p["id"]).precio_publico == 110
+
+def test_calc_price_coincide_con_la_base(client):
+    # 22636.67 * 1.5 is 33955.005: both round the cents up
+    cat = client.post("/api/categorias/", json={"nombre": "Medio centavo", "margen_porcentaje": 50}).json()
+    p = client.post("/api/productos/", json={"descripcion": "Mochila Medio Centavo", "costo_base": 22636.67, "categoria_id": cat["id"]}).json()
+    assert p["precio_publico"] == precios.calc_price(22636.67, 50) == 33956
@@ -0,0 +1,34 @@
+"""Importación de listas de precios de proveedores."""
+import io
+
+from backend import importer, models
+
+def _buscar(client, descripcion):
+    return [p for p in client.get("/api/productos/", params={"search": descripcion}).json() if p["descripcion"] == descripcion]
+
+def test_csv_utf8_con_la_muestra_cortada_en_un_acento():
+    encabezado = "descripcion;costo\n".encode()
+    relleno = "Relleno;1\n".encode()
+    cuerpo = relleno * ((64 * 1024 - len(encabezado)) // len(relleno))
+    # 'á' is two bytes in UTF-8: put its first byte last in the 64 KiB sample
+    falta = 64 * 1024 - 1 - len(encabezado) - len(cuerpo)
+    csv = encabezado + cuerpo + b"x" * falta + "á;2\nMatemática 3;100\n".encode()
+    assert csv[:64 * 1024].decode("utf-8", errors="replace").endswith("�")
+
+    filas = [datos for _, datos in importer.leer_filas(io.BytesIO(csv), "lista.csv")]
+    assert filas[-2]["descripcion"].endswith("xá")
+    assert filas[-1]["descripcion"] == "Matemática 3"
+
+def test_categoria_sin_margen_usa_el_costo(client, db):
+    cat = models.Categoria(nombre="Importación sin margen", margen_porcentaje=None)
+    db.add(cat); db.commit()
+    csv = "descripcion;costo\nCarpeta Importada Sin Margen;123,45\n".encode()
+    try:
+        r = client.post("/api/productos/importar", data={"categoria_id": cat.id}, files={"archivo": ("lista.csv", csv, "text/csv")})
+        assert r.status_code == 200 and r.json()["insertados"] == 1
+        [p] = _buscar(client, "Carpeta Importada Sin Margen")
+        assert p["precio_publico"] == p["costo_base"] == 123.45
+    finally:
+        # The categories list has no room for a NULL margin
+        db.query(models.Producto).filter(models.Producto.categoria_id == cat.id).delete()
+        db.delete(cat); db.commit()
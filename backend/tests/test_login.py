@@ -0,0 +1,21 @@
+"""Límite de intentos de login, con el cliente detrás del proxy."""
+from fastapi.testclient import TestClient
+
+from backend import auth
+from backend.main import app
+
+def _login(c, usuario, clave, ip):
+    return c.post("/api/token", data={"username": usuario, "password": clave}, headers={"X-Forwarded-For": ip})
+
+def test_el_limite_es_por_ip_reenviada():
+    with TestClient(app) as c:
+        for _ in range(auth.LOGIN_MAX_FAILURES_USER):
+            assert _login(c, "Admin", "mal", "203.0.113.1").status_code == 401
+        assert _login(c, "Admin", "Epaminondas01", "203.0.113.1").status_code == 429
+        # Another client behind the same proxy is not locked out
+        assert _login(c, "Admin", "Epaminondas01", "203.0.113.2").status_code == 200
+
+        for i in range(auth.LOGIN_MAX_FAILURES_IP):
+            _login(c, f"nadie{i}", "mal", "203.0.113.3")
+        assert _login(c, "otro", "mal", "203.0.113.3").status_code == 429
+        assert _login(c, "otro", "mal", "203.0.113.4").status_code == 401
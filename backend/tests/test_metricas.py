@@ -0,0 +1,11 @@
+"""Acceso a /metrics."""
+from backend import metricas
+
+def test_metrics_pide_credenciales(client, monkeypatch):
+    assert client.get("/metrics", headers={"Authorization": ""}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer basura"}).status_code == 401
+    assert client.get("/metrics").status_code == 200  # the session's user token
+
+    monkeypatch.setattr(metricas, "METRICS_TOKEN", "raspador")
+    assert client.get("/metrics", headers={"Authorization": "Bearer raspador"}).status_code == 200
+    assert client.get("/metrics", headers={"Authorization": "Bearer otro"}).status_code == 401
@@ -0,0 +1,118 @@
+"""Cada listado carga sus relaciones con una cantidad fija de sentencias SQL.
+
+Se siembran 2 filas (con sus hijos), se cuenta; se agregan 8 más y la
+cuenta tiene que ser la misma. Un lazy load por fila la haría crecer.
+"""
+import itertools
+import random
+import re
+from datetime import date
+
+import pytest
+from sqlalchemy import func, select
+
+from backend import models
+
+AGREGADAS = 8
+_azar = random.Random(0)
+_filas = itertools.count()
+
+def sentencias(respuesta) -> int:
+    """Sentencias SQL del request, según el Server-Timing de metricas.py."""
+    return int(re.search(r'desc="(\d+) queries"', respuesta.headers["Server-Timing"]).group(1))
+
+def _marca() -> str:
+    # Random letters: no trigrams in common with other tests' names
+    return "".join(_azar.choice("bcdfghjklmnpqrstvwxz") for _ in range(10))
+
+def _nombre(marca: str) -> str:
+    # Unique per row, letters only so names stay names
+    return f"{marca} " + "".join(chr(ord("a") + int(d)) for d in str(next(_filas)))
+
+def _pedidos(archivado=False, **extra):
+    def sembrar(db, n, marca):
+        for _ in range(n):
+            db.add(models.Pedido(
+                cliente=_nombre(marca), fecha=date(2026, 3, 1), archivado=archivado, **extra,
+                libros=[models.LibroPedido(titulo="Mate 3"), models.LibroPedido(titulo="Lengua 3")],
+                pagos=[models.PagoPedido(monto=10, fecha=date(2026, 3, 1))],
+            ))
+    return sembrar
+
+def _productos(db, n, marca):
+    for _ in range(n):
+        # A category each, so touching p.categoria would show up
+        cat = models.Categoria(nombre=_nombre(marca), margen_porcentaje=30)
+        db.add(models.Producto(descripcion=_nombre(marca), costo_base=10, precio_publico=13, categoria=cat))
+
+def _stock(db, n, marca):
+    db.add_all(models.StockLibro(titulo=_nombre(marca), tipo="nuevo", cantidad=1) for _ in range(n))
+
+def _trabajos(estado):
+    def sembrar(db, n, marca):
+        for _ in range(n):
+            db.add(models.TrabajoFotocopia(
+                solicitante=_nombre(marca), material="Apunte", estado=estado, fecha=date(2026, 3, 1),
+                pagos=[models.PagoFotocopia(monto=5, fecha=date(2026, 3, 1))],
+            ))
+    return sembrar
+
+def _clientes(db, n, marca):
+    for _ in range(n):
+        db.add(models.Cliente(nombre=_nombre(marca), transacciones=[
+            models.TransaccionFiado(fecha=date(2026, 3, 1), detalle="x", tipo_operacion="cargo", monto=5),
+        ]))
+
+def _grados(db, n, marca):
+    for _ in range(n):
+        db.add(models.Grado(nombre=_nombre(marca), libros=[models.LibroCatalogo(titulo="Mate"), models.LibroCatalogo(titulo="Lengua")]))
+
+def _anios(db, n, marca):
+    for _ in range(n):
+        db.add(models.AnioFotocopia(nombre=_nombre(marca), materiales=[models.MaterialCatalogo(titulo="Apunte")]))
+
+def _categorias(db, n, marca):
+    db.add_all(models.Categoria(nombre=_nombre(marca), margen_porcentaje=30) for _ in range(n))
+
+def _archivo(db, n, marca):
+    for _ in range(n):
+        db.add(models.PedidoArchivo(
+            cliente=_nombre(marca), fecha=date(2025, 1, 1),
+            libros=[models.LibroPedidoArchivo(titulo="Mate 3", estado="entregado")],
+            pagos=[models.PagoPedidoArchivo(monto=10, fecha=date(2025, 1, 1))],
+        ))
+
+# url: (model paged with after_id or None, seeder, query params; "{marca}" is replaced)
+CASOS = {
+    "/api/productos/": (models.Producto, _productos, {}),
+    "/api/pedidos/": (models.Pedido, _pedidos(), {}),
+    "/api/pedidos/archivados/": (models.Pedido, _pedidos(archivado=True), {}),
+    "/api/pedidos/vencidos/": (None, _pedidos(fecha_tentativa=date(2000, 1, 1)), {"limit": 500}),
+    "/api/stock/": (models.StockLibro, _stock, {}),
+    "/api/trabajos-fotocopia/": (models.TrabajoFotocopia, _trabajos("pendiente"), {}),
+    "/api/trabajos-fotocopia/cola": (None, _trabajos("listo"), {"estado": "listo", "limit": 500}),
+    "/api/clientes/": (models.Cliente, _clientes, {}),
+    "/api/grados/": (None, _grados, {}),
+    "/api/anios-fotocopia/": (None, _anios, {}),
+    "/api/categorias/": (None, _categorias, {}),
+    "/api/archivo/pedidos/": (models.PedidoArchivo, _archivo, {}),
+    "/api/personas/buscar": (None, _clientes, {"q": "{marca}", "limit": 50}),
+}
+
+@pytest.mark.parametrize("url", CASOS)
+def test_sentencias_no_dependen_de_las_filas(client, db, url):
+    modelo, sembrar, params = CASOS[url]
+    marca = _marca()
+    params = {k: v.format(marca=marca) if isinstance(v, str) else v for k, v in params.items()}
+    if modelo is not None:
+        # Only this test's rows on the page
+        params["after_id"] = db.scalar(select(func.max(modelo.id))) or 0
+
+    sembrar(db, 2, marca); db.commit()
+    pocas = client.get(url, params=params)
+    sembrar(db, AGREGADAS, marca); db.commit()
+    muchas = client.get(url, params=params)
+
+    assert pocas.status_code == muchas.status_code == 200
+    assert len(muchas.json()) == len(pocas.json()) + AGREGADAS
+    assert sentencias(muchas) == sentencias(pocas)
@@ -17,6 +17,21 @@ const getHdr = () => {
     };
 };
 
+const PAGE_SIZE = 500;
+
+// Follows the keyset cursor (X-Next-After-Id) until the last page
+const fetchAll = async (url) => {
+    const items = [];
+    let after = null;
+    do {
+        const sep = url.includes('?') ? '&' : '?';
+        const r = await fetch(`${url}${sep}limit=${PAGE_SIZE}${after ? `&after_id=${after}` : ''}`, { headers: getHdr() });
+        items.push(...await json(r));
+        after = r.headers.get('X-Next-After-Id');
+    } while (after);
+    return items;
+};
+
 const api = {
     login: (username, password) => {
         const formData = new URLSearchParams();
@@ -35,7 +50,9 @@ const api = {
     updateCategoria: (id, d) => fetch(`${BASE}/categorias/${id}`, { method: 'PUT', headers: getHdr(), body: JSON.stringify(d) }).then(json),
     deleteCategoria: (id) => fetch(`${BASE}/categorias/${id}`, { method: 'DELETE', headers: getHdr() }).then(json),
 
-    getProductos: (search = '') => fetch(`${BASE}/productos/?search=${encodeURIComponent(search)}`, { headers: getHdr() }).then(json),
+    getProductos: (search = '') => search
+        ? fetch(`${BASE}/productos/?search=${encodeURIComponent(search)}`, { headers: getHdr() }).then(json)
+        : fetchAll(`${BASE}/productos/`),
     createProducto: (d) => fetch(`${BASE}/productos/`, { method: 'POST', headers: getHdr(), body: JSON.stringify(d) }).then(json),
     updateProducto: (id, d) => fetch(`${BASE}/productos/${id}`, { method: 'PUT', headers: getHdr(), body: JSON.stringify(d) }).then(json),
     deleteProducto: (id) => fetch(`${BASE}/productos/${id}`, { method: 'DELETE', headers: getHdr() }).then(json),
@@ -50,16 +67,26 @@ const api = {
     deleteLibroCatalogo: (id) => fetch(`${BASE}/libros-catalogo/${id}`, { method: 'DELETE', headers: getHdr() }).then(json),
 
     // === ENCARGOS — Pedidos ===
-    getPedidos: () => fetch(`${BASE}/pedidos/`, { headers: getHdr() }).then(json),
-    getPedidosArchivados: () => fetch(`${BASE}/pedidos/archivados/`, { headers: getHdr() }).then(json),
+    getPedidos: () => fetchAll(`${BASE}/pedidos/`),
+    getPedidosArchivados: () => fetchAll(`${BASE}/pedidos/archivados/`),
     createPedido: (d) => fetch(`${BASE}/pedidos/`, { method: 'POST', headers: getHdr(), body: JSON.stringify(d) }).then(json),
+    createPedidoDesdeGrado: (gradoId, d) => fetch(`${BASE}/grados/${gradoId}/pedidos/`, { method: 'POST', headers: getHdr(), body: JSON.stringify(d) }).then(json),
     deletePedido: (id) => fetch(`${BASE}/pedidos/${id}`, { method: 'DELETE', headers: getHdr() }).then(json),
     addLibroPedido: (pedidoId, d) => fetch(`${BASE}/pedidos/${pedidoId}/libros/`, { method: 'POST', headers: getHdr(), body: JSON.stringify(d) }).then(json),
     updateLibroEstado: (id, estado) => fetch(`${BASE}/libros-pedido/${id}/estado?estado=${estado}`, { method: 'PUT', headers: getHdr() }).then(json),
+    updateLibrosEstado: (cambios) => fetch(`${BASE}/libros-pedido/estado`, { method: 'PUT', headers: getHdr(), body: JSON.stringify(cambios) }).then(json),
     addPagoPedido: (pedidoId, d) => fetch(`${BASE}/pedidos/${pedidoId}/pagos/`, { method: 'POST', headers: getHdr(), body: JSON.stringify(d) }).then(json),
 
+    // === ENCARGOS — Archivo histórico ===
+    // One page of old orders; pass the previous X-Next-After-Id as `after`
+    buscarArchivo: async (search = '', after = null) => {
+        const r = await fetch(`${BASE}/archivo/pedidos/?search=${encodeURIComponent(search)}${after ? `&after_id=${after}` : ''}`, { headers: getHdr() });
+        return { items: await json(r), next: r.headers.get('X-Next-After-Id') };
+    },
+    restaurarPedido: (id) => fetch(`${BASE}/archivo/pedidos/${id}/restaurar`, { method: 'POST', headers: getHdr() }).then(json),
+
     // === ENCARGOS — Stock ===
-    getStock: () => fetch(`${BASE}/stock/`, { headers: getHdr() }).then(json),
+    getStock: () => fetchAll(`${BASE}/stock/`),
     createStock: (d) => fetch(`${BASE}/stock/`, { method: 'POST', headers: getHdr(), body: JSON.stringify(d) }).then(json),
     updateStock: (id, d) => fetch(`${BASE}/stock/${id}`, { method: 'PUT', headers: getHdr(), body: JSON.stringify(d) }).then(json),
     marcarComoPedido: (titulo) => fetch(`${BASE}/stock/marcar-pedido/`, { method: 'POST', headers: getHdr(), body: JSON.stringify({ titulo }) }).then(json),
@@ -75,18 +102,41 @@ const api = {
     updateMaterial: (id, d) => fetch(`${BASE}/materiales-catalogo/${id}`, { method: 'PUT', headers: getHdr(), body: JSON.stringify(d) }).then(json),
     deleteMaterial: (id) => fetch(`${BASE}/materiales-catalogo/${id}`, { method: 'DELETE', headers: getHdr() }).then(json),
 
-    getTrabajos: () => fetch(`${BASE}/trabajos-fotocopia/`, { headers: getHdr() }).then(json),
+    getTrabajos: () => fetchAll(`${BASE}/trabajos-fotocopia/`),
     createTrabajo: (d) => fetch(`${BASE}/trabajos-fotocopia/`, { method: 'POST', headers: getHdr(), body: JSON.stringify(d) }).then(json),
     updateTrabajoEstado: (id, estado) => fetch(`${BASE}/trabajos-fotocopia/${id}/estado?estado=${estado}`, { method: 'PUT', headers: getHdr() }).then(json),
+    getColaTrabajos: (estado = 'pendiente') => fetchAll(`${BASE}/trabajos-fotocopia/cola?estado=${estado}`),
+    getResumenTrabajos: () => fetch(`${BASE}/trabajos-fotocopia/resumen`, { headers: getHdr() }).then(json),
+    updateTrabajosEstado: (cambios) => fetch(`${BASE}/trabajos-fotocopia/estado`, { method: 'PUT', headers: getHdr(), body: JSON.stringify(cambios) }).then(json),
     deleteTrabajo: (id) => fetch(`${BASE}/trabajos-fotocopia/${id}`, { method: 'DELETE', headers: getHdr() }).then(json),
     addPagoFotocopia: (trabajoId, d) => fetch(`${BASE}/trabajos-fotocopia/${trabajoId}/pagos/`, { method: 'POST', headers: getHdr(), body: JSON.stringify(d) }).then(json),
 
     // === LIBRETA ===
-    getClientes: () => fetch(`${BASE}/clientes/`, { headers: getHdr() }).then(json),
+    getClientes: () => fetchAll(`${BASE}/clientes/`),
     createCliente: (d) => fetch(`${BASE}/clientes/`, { method: 'POST', headers: getHdr(), body: JSON.stringify(d) }).then(json),
     updateCliente: (id, d) => fetch(`${BASE}/clientes/${id}`, { method: 'PUT', headers: getHdr(), body: JSON.stringify(d) }).then(json),
     deleteCliente: (id) => fetch(`${BASE}/clientes/${id}`, { method: 'DELETE', headers: getHdr() }).then(json),
     addTransaccion: (clienteId, d) => fetch(`${BASE}/clientes/${clienteId}/transacciones/`, { method: 'POST', headers: getHdr(), body: JSON.stringify(d) }).then(json),
+
+    // === BUSCADOR DE PERSONAS ===
+    buscarPersona: (q) => fetch(`${BASE}/personas/buscar?q=${encodeURIComponent(q)}`, { headers: getHdr() }).then(json),
+
+    // === SINCRONIZACIÓN ===
+    // Rows changed/deleted since `cursor` (omit for everything); repeat with
+    // the returned cursor while `mas` is true. 410 means start over.
+    sync: (cursor) => fetch(`${BASE}/sync${cursor ? `?since=${encodeURIComponent(cursor)}` : ''}`, { headers: getHdr() }).then(json),
+
+    // === EVENTOS (cambios en vivo) ===
+    // Calls onCambio once per burst of the given server events (or after a
+    // "reset", when events were missed). Returns a function that disconnects.
+    suscribirEventos: (nombres, onCambio) => {
+        const token = localStorage.getItem("token") || '';
+        const es = new EventSource(`${BASE}/eventos?token=${encodeURIComponent(token)}`);
+        let timer = null;
+        const aviso = () => { clearTimeout(timer); timer = setTimeout(onCambio, 250); };
+        [...nombres, 'reset'].forEach(n => es.addEventListener(n, aviso));
+        return () => { clearTimeout(timer); es.close(); };
+    },
 };
 
 export default api;
@@ -221,6 +221,8 @@ export default function Encargos() {
         } catch { notify('❌ Error al cargar datos'); }
     };
     useEffect(() => { reload(); }, []);
+    // Changes made from other terminals
+    useEffect(() => api.suscribirEventos(['pedido.creado', 'pedido.eliminado', 'pedido.archivado', 'pedido.restaurado', 'pedido.movido_al_archivo', 'libro_pedido.agregado', 'libro_pedido.estado', 'pago_pedido.creado', 'stock.cambiado'], reload), []);
 
     // Modal states
     const [mNuevo, setMNuevo] = useState(false);
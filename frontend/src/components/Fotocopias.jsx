@@ -21,6 +21,8 @@ export default function Fotocopias() {
         } catch { notify('❌ Error al cargar datos'); }
     };
     useEffect(() => { reload(); }, []);
+    // Changes made from other terminals
+    useEffect(() => api.suscribirEventos(['trabajo.creado', 'trabajo.estado', 'trabajo.eliminado', 'pago_fotocopia.creado'], reload), []);
 
     // Modal states
     const [mNuevo, setMNuevo] = useState(false);
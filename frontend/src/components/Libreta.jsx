@@ -4,7 +4,8 @@ import api from '../api';
 import { matchSearch } from '../utils';
 
 const fmt = (n) => new Intl.NumberFormat('es-AR', { style: 'currency', currency: 'ARS' }).format(n);
-const today = () => new Date().toLocaleDateString('es-AR');
+const today = () => new Date().toISOString().split('T')[0];
+const fmtFecha = (f) => f ? new Date(`${f}T00:00:00`).toLocaleDateString('es-AR') : '';
 
 export default function Libreta() {
     const [clientes, setClientes] = useState([]);
@@ -119,7 +120,7 @@ export default function Libreta() {
                         <tbody className="divide-y divide-gray-100">
                             {selectedClient.transacciones.map(t => (
                                 <tr key={t.id} className="hover:bg-gray-50 transition-colors">
-                                    <td className="p-5 text-gray-500 whitespace-nowrap">{t.fecha}</td>
+                                    <td className="p-5 text-gray-500 whitespace-nowrap">{fmtFecha(t.fecha)}</td>
                                     <td className="p-5 font-medium text-gray-800">{t.detalle}</td>
                                     <td className={`p-5 text-right font-bold text-lg ${t.tipo_operacion === 'cargo' ? 'text-red-500' : 'text-green-500'}`}>
                                         {t.tipo_operacion === 'cargo' ? '+ ' : '- '}{fmt(t.monto)}